@@ -0,0 +1,96 @@
+import os
+import glob
+import gzip
+import json
+import time
+import logging
+import argparse
+import tracemalloc
+import yaml
+import binary_feed
+
+# Configure logging with a cleaner and more human-readable format
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%B %d, %Y %I:%M %p'
+)
+
+# libyaml is much faster than the pure-Python loader, when PyYAML was built with it
+yaml_loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def time_decode(decode, content, repeat):
+    # Best of several runs, to keep scheduler noise out of the comparison
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decode(content)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def peak_memory(decode, content):
+    tracemalloc.start()
+    try:
+        decode(content)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_feed(json_path, repeat):
+    """
+    Compare decoding a feed from JSON, YAML and the binary format, and check that the
+    binary feed decodes to exactly the JSON data.
+
+    Returns:
+        bool: True if the binary feed round-trips.
+    """
+    base = os.path.splitext(json_path)[0]
+    with open(json_path, "rb") as f:
+        json_content = f.read()
+    data = json.loads(json_content)
+    formats = [
+        ("json", json_content, json.loads),
+        ("json (minified)", json.dumps(data, separators=(",", ":")).encode("utf-8"), json.loads),
+        ("cbor", binary_feed.encode(data), binary_feed.decode),
+    ]
+    if os.path.exists(f"{base}.yaml"):
+        with open(f"{base}.yaml", "rb") as f:
+            formats.insert(2, (f"yaml ({yaml_loader.__name__})", f.read(), lambda content: yaml.load(content, Loader=yaml_loader)))
+
+    round_trips = binary_feed.decode(formats[-1][1]) == data
+
+    print(f"{os.path.basename(base)}")
+    print(f"  {'format':<22} {'bytes':>9} {'gzip':>8} {'decode':>10} {'peak memory':>12}")
+    for name, content, decode in formats:
+        elapsed = time_decode(decode, content, repeat)
+        peak = peak_memory(decode, content)
+        compressed = len(gzip.compress(content, compresslevel=9, mtime=0))
+        print(f"  {name:<22} {len(content):9} {compressed:8} {elapsed * 1000:7.2f} ms {peak / 1024:9.0f} KB")
+    if not round_trips:
+        print("  cbor: DIFFERENT DATA AFTER DECODING")
+    return round_trips
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the size and decode time of the JSON, YAML and binary feeds.")
+    parser.add_argument("--feeds", default="latest_raw_files", help="directory holding the generated feeds")
+    parser.add_argument("--repeat", type=int, default=20, help="number of timed decodes per format")
+    args = parser.parse_args()
+
+    json_paths = sorted(path for path in glob.glob(os.path.join(args.feeds, "*.json")) if not path.endswith(".min.json"))
+    if not json_paths:
+        logging.error(f"No JSON feeds found in {args.feeds}")
+        return 1
+
+    round_trips = True
+    for json_path in json_paths:
+        round_trips = benchmark_feed(json_path, args.repeat) and round_trips
+    return 0 if round_trips else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
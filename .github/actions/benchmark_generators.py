@@ -0,0 +1,115 @@
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+# Configure logging with a cleaner and more human-readable format
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%B %d, %Y %I:%M %p'
+)
+
+actions_dir = os.path.dirname(os.path.abspath(__file__))
+repo_root = os.path.dirname(os.path.dirname(actions_dir))
+
+# Every generator, in the order the workflow runs them
+generators = {
+    "macos_standalone_latest": "generate_macos_standalone_latest.py",
+    "ios_appstore_latest": "generate_ios_appstore_latest.py",
+    "macos_appstore_latest": "generate_macos_appstore_latest.py",
+    "macos_standalone_cve_history": "generate_macos_standalone_cve_history.py",
+    "macos_standalone_update_history": "generate_macos_standalone_update_history.py",
+    "readme": "update_readme.py",
+}
+
+
+def make_workspace():
+    """
+    Copy the files the generators read and write into a fresh directory, so every run
+    starts from the committed feeds with empty caches and never touches the repository.
+
+    Returns:
+        str: The workspace directory.
+    """
+    workspace = tempfile.mkdtemp(prefix="mofa-bench-")
+    shutil.copytree(os.path.join(repo_root, "latest_raw_files"), os.path.join(workspace, "latest_raw_files"))
+    shutil.copy(os.path.join(repo_root, "README.md"), os.path.join(workspace, "README.md"))
+    return workspace
+
+
+def run_generator(script, workspace, env):
+    """
+    Run one generator in its own process inside the workspace.
+
+    Returns:
+        tuple: (wall time in seconds, error message or None)
+    """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.join(actions_dir, script)], cwd=workspace, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+
+    if result.returncode != 0:
+        return elapsed, f"exit code {result.returncode}: {result.stderr.strip().splitlines()[-1:]}"
+    # Generators log and carry on when a request fails, which would make a run look fast
+    missing = result.stderr.count("No recorded fixture for")
+    if missing:
+        return elapsed, f"{missing} requests had no recorded fixture"
+    return elapsed, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time every generator end to end against recorded HTTP fixtures.")
+    parser.add_argument("--record", action="store_true", help="run every generator once against the live servers and record the fixtures")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per generator")
+    parser.add_argument("--latency-ms", type=float, default=0, help="delay added to every replayed response")
+    parser.add_argument("--warm", action="store_true", help="run each generator once before timing, so caches are warm")
+    parser.add_argument("--fixtures", default=os.environ.get("MOFA_FIXTURES_DIR", os.path.join(repo_root, ".cache", "fixtures")), help="fixture store directory")
+    parser.add_argument("generators", nargs="*", help=f"generators to run (default: all): {', '.join(generators)}")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.generators if name not in generators]
+    if unknown:
+        parser.error(f"unknown generators: {', '.join(unknown)}")
+
+    env = dict(os.environ)
+    env["MOFA_HTTP_MODE"] = "record" if args.record else "replay"
+    env["MOFA_FIXTURES_DIR"] = os.path.abspath(args.fixtures)
+    env["MOFA_REPLAY_LATENCY_MS"] = str(args.latency_ms)
+
+    names = args.generators or list(generators)
+    repeat = 1 if args.record else args.repeat
+    failed = False
+
+    print(f"{'generator':<34} {'best':>9} {'median':>9}  runs")
+    for name in names:
+        times = []
+        error = None
+        for _ in range(repeat):
+            workspace = make_workspace()
+            try:
+                if args.warm:
+                    run_generator(generators[name], workspace, env)
+                elapsed, error = run_generator(generators[name], workspace, env)
+            finally:
+                shutil.rmtree(workspace, ignore_errors=True)
+            if error:
+                break
+            times.append(elapsed)
+
+        if error:
+            failed = True
+            print(f"{name:<34} FAILED: {error}")
+        else:
+            print(f"{name:<34} {min(times):8.3f}s {statistics.median(times):8.3f}s  {len(times)}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,109 @@
+import os
+import time
+import logging
+import argparse
+from bs4 import BeautifulSoup
+import http_session
+import page_parser
+import generate_macos_standalone_cve_history
+import generate_macos_standalone_update_history
+
+# Configure logging with a cleaner and more human-readable format
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%B %d, %Y %I:%M %p'
+)
+
+# Directory holding saved copies of the scraped pages
+pages_dir = os.environ.get("MOFA_PAGES_DIR", ".cache/pages")
+
+
+def extract_update_history(soup):
+    table = generate_macos_standalone_update_history.find_history_table(soup)
+    return generate_macos_standalone_update_history.parse_releases(table) if table else None
+
+
+def extract_cve_history(soup):
+    return generate_macos_standalone_cve_history.parse_release_notes(soup)
+
+
+# Saved page -> (URL, subtree the scraper parses, function extracting the scraper's data)
+pages = {
+    "update_history.html": (generate_macos_standalone_update_history.url, "table", extract_update_history),
+    "release_notes.html": (generate_macos_standalone_cve_history.url, "main", extract_cve_history),
+}
+
+
+def fetch_pages():
+    os.makedirs(pages_dir, exist_ok=True)
+    for file_name, (url, _, _) in pages.items():
+        response = http_session.get(url)
+        response.raise_for_status()
+        with open(os.path.join(pages_dir, file_name), "w", encoding="utf-8") as f:
+            f.write(response.text)
+        logging.info(f"Saved {url} to {file_name}")
+
+
+def time_parse(parse, repeat):
+    # Best of several runs, to keep scheduler noise out of the comparison
+    best = None
+    soup = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        soup = parse()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, soup
+
+
+def benchmark_page(file_name, repeat):
+    """
+    Time every available backend on one saved page and check that the scraper extracts
+    the same data as from the whole page parsed with html.parser.
+
+    Returns:
+        bool: True if every backend produced identical output.
+    """
+    _, only, extract = pages[file_name]
+    with open(os.path.join(pages_dir, file_name), "r", encoding="utf-8") as f:
+        html = f.read()
+
+    # Silence the scrapers' per-section logging while timing
+    logging.disable(logging.WARNING)
+    try:
+        baseline_time, baseline_soup = time_parse(lambda: BeautifulSoup(html, "html.parser"), repeat)
+        expected = extract(baseline_soup)
+        results = [("html.parser (whole page)", baseline_time, True)]
+        for backend in page_parser.available_backends():
+            elapsed, soup = time_parse(lambda: page_parser.parse(html, only=only, backend=backend), repeat)
+            results.append((f"{backend} (<{only}> only)", elapsed, extract(soup) == expected))
+    finally:
+        logging.disable(logging.NOTSET)
+
+    print(f"{file_name} ({len(html.encode('utf-8')) / 1024:.0f} KB)")
+    for name, elapsed, identical in results:
+        print(f"  {name:<28} {elapsed * 1000:9.1f} ms  {baseline_time / elapsed:5.1f}x  {'identical' if identical else 'DIFFERENT OUTPUT'}")
+    return all(identical for _, _, identical in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare HTML parser backends on saved copies of the scraped pages.")
+    parser.add_argument("--fetch", action="store_true", help=f"download fresh copies of the pages into {pages_dir} first")
+    parser.add_argument("--repeat", type=int, default=5, help="number of timed parses per backend")
+    args = parser.parse_args()
+
+    if args.fetch:
+        fetch_pages()
+
+    identical = True
+    for file_name in pages:
+        if not os.path.exists(os.path.join(pages_dir, file_name)):
+            logging.error(f"{file_name} not found in {pages_dir}; run with --fetch to download it.")
+            return 1
+        identical = benchmark_page(file_name, args.repeat) and identical
+    return 0 if identical else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
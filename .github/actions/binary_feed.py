@@ -0,0 +1,259 @@
+import sys
+import json
+import struct
+import argparse
+
+# Compact binary encoding of a feed, published as <feed>.cbor next to the XML, JSON and YAML.
+#
+# The file is a single CBOR item (RFC 8949) behind the self-described CBOR tag 55799:
+#
+#     ["mofa-feed", 2, strings, 1297040961(data)]
+#
+# strings is the shared string table, front-coded: the table is sorted and stored as a
+# flat array [shared_0, suffix_0, shared_1, suffix_1, ...], where entry i is the first
+# shared_i characters of entry i - 1 followed by suffix_i. Sorting puts the URLs with the
+# same officecdn/go.microsoft.com prefix, and versions of the same build line, next to
+# each other, so each is stored as a short suffix.
+#
+# data is the feed as the generators assemble it for JSON and YAML (maps keep their
+# order), except that every string in the table, key or value, is written as its index
+# in the table (an unsigned integer) instead of inline. Tag 1297040961 ("MOFA" in ASCII)
+# marks that scope: inside it, an unsigned integer is always a string reference. It is
+# not registered with IANA; it is in the first-come-first-served range (32768 and up),
+# so it does not take over the meaning of a registered tag, and a generic CBOR reader
+# reports it as an unknown tag around the raw indexes. The standard stringref tags
+# (25/256) are not used because they refer to strings in order of first appearance,
+# which rules out the sorted, front-coded table.
+#
+# The feeds hold no numbers (every value is text in the XML, JSON and YAML as well), so
+# the data may only contain maps, arrays, text strings, booleans and null.
+
+magic = "mofa-feed"
+version = 2
+
+# Strings this long or longer are always put in the table (URLs, release notes): they
+# share prefixes with other entries even when they occur once. Shorter strings only go in
+# the table when they repeat.
+table_min_length = 16
+
+self_describe_tag = 55799
+string_table_tag = 1297040961
+
+
+def _collect_strings(item, counts):
+    if isinstance(item, str):
+        counts[item] = counts.get(item, 0) + 1
+    elif isinstance(item, dict):
+        for key, value in item.items():
+            _collect_strings(key, counts)
+            _collect_strings(value, counts)
+    elif isinstance(item, (list, tuple)):
+        for value in item:
+            _collect_strings(value, counts)
+
+
+def _build_table(data):
+    counts = {}
+    _collect_strings(data, counts)
+    # A reference costs 1-3 bytes, so strings of 3 characters or less are cheaper inline
+    return sorted(s for s, n in counts.items() if len(s) >= table_min_length or (n > 1 and len(s) > 3))
+
+
+def _front_code(strings):
+    coded = []
+    previous = ""
+    for s in strings:
+        shared = 0
+        limit = min(len(previous), len(s))
+        while shared < limit and previous[shared] == s[shared]:
+            shared += 1
+        coded.extend((shared, s[shared:]))
+        previous = s
+    return coded
+
+
+def _write_head(out, major, value):
+    if value < 24:
+        out.append(major << 5 | value)
+    elif value < 0x100:
+        out.append(major << 5 | 24)
+        out.append(value)
+    elif value < 0x10000:
+        out.append(major << 5 | 25)
+        out += value.to_bytes(2, "big")
+    elif value < 0x100000000:
+        out.append(major << 5 | 26)
+        out += value.to_bytes(4, "big")
+    else:
+        out.append(major << 5 | 27)
+        out += value.to_bytes(8, "big")
+
+
+def _write_item(out, item, index):
+    if item is None:
+        out.append(0xf6)
+    elif item is True:
+        out.append(0xf5)
+    elif item is False:
+        out.append(0xf4)
+    elif isinstance(item, (int, float)) and index is not None:
+        # Unsigned integers in the data are string references
+        raise TypeError(f"Cannot encode the number {item!r} in a binary feed")
+    elif isinstance(item, int):
+        if item >= 0:
+            _write_head(out, 0, item)
+        else:
+            _write_head(out, 1, -1 - item)
+    elif isinstance(item, float):
+        out.append(0xfb)
+        out += struct.pack(">d", item)
+    elif isinstance(item, str):
+        position = index.get(item) if index is not None else None
+        if position is None:
+            encoded = item.encode("utf-8")
+            _write_head(out, 3, len(encoded))
+            out += encoded
+        else:
+            _write_head(out, 0, position)
+    elif isinstance(item, (list, tuple)):
+        _write_head(out, 4, len(item))
+        for value in item:
+            _write_item(out, value, index)
+    elif isinstance(item, dict):
+        _write_head(out, 5, len(item))
+        for key, value in item.items():
+            _write_item(out, key, index)
+            _write_item(out, value, index)
+    else:
+        raise TypeError(f"Cannot encode {type(item).__name__} in a binary feed")
+
+
+def encode(data):
+    """
+    Encode feed data (the dict written to JSON and YAML) in the binary feed format.
+
+    The output only depends on the data, so unchanged data always gives identical bytes.
+
+    Returns:
+        bytes: The encoded feed.
+    """
+    strings = _build_table(data)
+    out = bytearray()
+    _write_head(out, 6, self_describe_tag)
+    _write_head(out, 4, 4)
+    _write_item(out, magic, None)
+    _write_item(out, version, None)
+    _write_item(out, _front_code(strings), None)
+    _write_head(out, 6, string_table_tag)
+    _write_item(out, data, {s: i for i, s in enumerate(strings)})
+    return bytes(out)
+
+
+def _read_argument(data, pos, info):
+    if info < 24:
+        return info, pos
+    if info == 24:
+        return data[pos], pos + 1
+    if info == 25:
+        return int.from_bytes(data[pos:pos + 2], "big"), pos + 2
+    if info == 26:
+        return int.from_bytes(data[pos:pos + 4], "big"), pos + 4
+    if info == 27:
+        return int.from_bytes(data[pos:pos + 8], "big"), pos + 8
+    raise ValueError(f"Unsupported CBOR length encoding {info} at offset {pos - 1}")
+
+
+def _read_item(data, pos, strings):
+    initial = data[pos]
+    pos += 1
+    major = initial >> 5
+    info = initial & 0x1f
+
+    if major == 7:
+        if info == 20:
+            return False, pos
+        if info == 21:
+            return True, pos
+        if info == 22:
+            return None, pos
+        if info == 26:
+            return struct.unpack(">f", data[pos:pos + 4])[0], pos + 4
+        if info == 27:
+            return struct.unpack(">d", data[pos:pos + 8])[0], pos + 8
+        raise ValueError(f"Unsupported CBOR simple value {info} at offset {pos - 1}")
+
+    value, pos = _read_argument(data, pos, info)
+    if major == 0:
+        return (value if strings is None else strings[value]), pos
+    if major == 1:
+        return -1 - value, pos
+    if major == 2:
+        return bytes(data[pos:pos + value]), pos + value
+    if major == 3:
+        return str(data[pos:pos + value], "utf-8"), pos + value
+    if major == 4:
+        items = []
+        for _ in range(value):
+            item, pos = _read_item(data, pos, strings)
+            items.append(item)
+        return items, pos
+    if major == 5:
+        mapping = {}
+        for _ in range(value):
+            key, pos = _read_item(data, pos, strings)
+            mapping[key], pos = _read_item(data, pos, strings)
+        return mapping, pos
+    raise ValueError(f"Unsupported CBOR tag {value} at offset {pos}")
+
+
+def decode(data):
+    """
+    Reference decoder: read a binary feed back into the same data as the JSON file.
+
+    Returns:
+        dict: The feed data.
+    """
+    data = memoryview(data)
+    pos = 0
+    # The self-described CBOR tag is optional for readers
+    if data[:3].tobytes() == b"\xd9\xd9\xf7":
+        pos = 3
+    if data[pos] != 0x84:
+        raise ValueError("Not a binary feed: expected a 4-item array")
+    pos += 1
+
+    file_magic, pos = _read_item(data, pos, None)
+    file_version, pos = _read_item(data, pos, None)
+    if file_magic != magic or file_version != version:
+        raise ValueError(f"Unsupported binary feed {file_magic!r} version {file_version!r}")
+
+    coded, pos = _read_item(data, pos, None)
+    strings = []
+    previous = ""
+    for i in range(0, len(coded), 2):
+        previous = previous[:coded[i]] + coded[i + 1]
+        strings.append(previous)
+
+    initial = data[pos]
+    tag, pos = _read_argument(data, pos + 1, initial & 0x1f)
+    if initial >> 5 != 6 or tag != string_table_tag:
+        raise ValueError(f"Not a binary feed: expected tag {string_table_tag} around the data")
+    feed, pos = _read_item(data, pos, strings)
+    if pos != len(data):
+        raise ValueError(f"Trailing data after the feed at offset {pos}")
+    return feed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode a binary (.cbor) feed and print it as JSON.")
+    parser.add_argument("path", help="the .cbor feed file")
+    args = parser.parse_args()
+
+    with open(args.path, "rb") as f:
+        feed = decode(f.read())
+    json.dump(feed, sys.stdout, indent=4)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
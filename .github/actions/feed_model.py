@@ -0,0 +1,105 @@
+import io
+import json
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+import yaml
+import xml_writer
+import binary_feed
+import output_stage
+
+Package = Dict[str, Optional[str]]
+
+
+@dataclass
+class Feed:
+    """
+    In-memory model of a generated feed: a run timestamp followed by an ordered list of
+    packages. The same model is serialized directly to XML, JSON and YAML.
+
+    Attributes:
+        root_tag (str): Tag of the XML root element (e.g. "latest").
+        timestamp_key (str): Name of the run timestamp (e.g. "last_updated").
+        timestamp (str): The run timestamp itself.
+        package_tag (str): XML tag of each package element (e.g. "package").
+        packages_key (str): Key of the package list in JSON/YAML (e.g. "packages").
+        fields (tuple): When set, every package is written to JSON/YAML with exactly these
+            fields in this order, and fields missing from a package are written as "N/A".
+        strip_values (bool): Strip surrounding whitespace from values in JSON/YAML.
+        packages (list): The packages, each an ordered mapping of field name to value.
+    """
+
+    root_tag: str
+    timestamp_key: str
+    timestamp: str
+    package_tag: str
+    packages_key: str
+    fields: Tuple[str, ...] = ()
+    strip_values: bool = False
+    packages: List[Package] = field(default_factory=list)
+
+    def add_package(self, package: Package) -> None:
+        self.packages.append(package)
+
+    def _value(self, value: Optional[str]) -> Optional[str]:
+        # Mirror what reading the value back from the XML output would give: empty
+        # elements have no text, and XML parsers normalize line endings
+        if not value:
+            return None
+        value = value.replace("\r\n", "\n").replace("\r", "\n")
+        return value.strip() if self.strip_values else value
+
+    def to_dict(self) -> dict:
+        packages = []
+        for package in self.packages:
+            if self.fields:
+                packages.append({key: self._value(package.get(key, "N/A")) for key in self.fields})
+            else:
+                packages.append({key: self._value(value) for key, value in package.items()})
+        return {
+            self.timestamp_key: self._value(self.timestamp),
+            self.packages_key: packages,
+        }
+
+    def to_element(self) -> ET.Element:
+        root = ET.Element(self.root_tag)
+        ET.SubElement(root, self.timestamp_key).text = self.timestamp
+        for package in self.packages:
+            package_element = ET.SubElement(root, self.package_tag)
+            for key, value in package.items():
+                ET.SubElement(package_element, key).text = value
+        return root
+
+    def render_xml(self, indent: str = "\t") -> str:
+        buffer = io.StringIO()
+        xml_writer.write_pretty_xml(self.to_element(), buffer, indent=indent)
+        return buffer.getvalue()
+
+    def render_json(self, data: Optional[dict] = None) -> str:
+        return json.dumps(self.to_dict() if data is None else data, indent=4)
+
+    def render_yaml(self, data: Optional[dict] = None, dumper=yaml.Dumper) -> str:
+        return yaml.dump(self.to_dict() if data is None else data, Dumper=dumper, default_flow_style=False, sort_keys=False)
+
+    def render_binary(self, data: Optional[dict] = None) -> bytes:
+        return binary_feed.encode(self.to_dict() if data is None else data)
+
+    def write_outputs(self, xml_path: str, json_path: str, yaml_path: str, indent: str = "\t",
+                      data: Optional[dict] = None, dumper=yaml.Dumper, binary_path: Optional[str] = None) -> Dict[str, bool]:
+        """
+        Write the XML, JSON and YAML files of the feed (and the binary feed, when a path
+        is given) together as one snapshot. Files that would only change in their run
+        timestamp are left untouched.
+
+        Returns:
+            dict: Path -> True if the file was written.
+        """
+        data = self.to_dict() if data is None else data
+        outputs = {
+            xml_path: self.render_xml(indent),
+            json_path: self.render_json(data),
+            yaml_path: self.render_yaml(data, dumper),
+        }
+        if binary_path:
+            outputs[binary_path] = self.render_binary(data)
+        return output_stage.write_outputs(outputs)
@@ -1,13 +1,11 @@
-import requests
-import json
-import xml.etree.ElementTree as ET
+import http_cache
 from datetime import datetime
 import logging
-from xml.dom.minidom import parseString
 import pytz
 import yaml
-from collections import defaultdict, OrderedDict
 import os
+import feed_model
+import run_report
 
 # Configure logging with a cleaner and more human-readable format
 logging.basicConfig(
@@ -32,10 +30,6 @@ def get_current_date_time():
 
     return formatted_date_time
 
-# Call the function to test it
-last_update_date_time = get_current_date_time()
-logging.info(f"Current date and time: {last_update_date_time}")
-
 # Define common keys
 common_keys = {
     "application_name": "trackName",
@@ -50,26 +44,32 @@ common_keys = {
 # Define app-specific configurations
 apps = {
     "iOS Microsoft Word": {
+        "bundleId": "com.microsoft.Office.Word",
         "url": "https://itunes.apple.com/search?term=microsoft-word&country=us&entity=software",
         "keys": common_keys
     },
     "iOS Microsoft Excel": {
+        "bundleId": "com.microsoft.Office.Excel",
         "url": "https://itunes.apple.com/search?term=microsoft-excel&country=us&entity=software",
         "keys": common_keys
     },
     "iOS Microsoft PowerPoint": {
+        "bundleId": "com.microsoft.Office.Powerpoint",
         "url": "https://itunes.apple.com/search?term=microsoft-powerpoint&country=us&entity=software",
         "keys": common_keys
     },
     "iOS Microsoft Outlook": {
+        "bundleId": "com.microsoft.Office.Outlook",
         "url": "https://itunes.apple.com/search?term=microsoft-outlook&country=us&entity=software",
         "keys": common_keys
     },
     "iOS Microsoft OneNote": {
+        "bundleId": "com.microsoft.onenote",
         "url": "https://itunes.apple.com/search?term=microsoft-onenote&country=us&entity=software",
         "keys": common_keys
     },
     "iOS Microsoft OneDrive": {
+        "bundleId": "com.microsoft.skydrive",
         "url": "https://itunes.apple.com/search?term=microsoft-onedrive&country=us&entity=software",
         "keys": common_keys
     },
@@ -78,6 +78,7 @@ apps = {
         "keys": common_keys
     },
     "iOS Microsoft Defender Security": {
+        "bundleId": "com.microsoft.scmx",
         "url": "https://itunes.apple.com/search?term=microsoft-defender-security&country=us&entity=software",
         "keys": common_keys
     },
@@ -86,10 +87,12 @@ apps = {
         "keys": common_keys
     },
     "iOS Microsoft Loop": {
+        "bundleId": "com.microsoft.loop",
         "url": "https://itunes.apple.com/search?term=microsoft-loop&country=us&entity=software",
         "keys": common_keys
     },
     "iOS Microsoft Warehouse Management": {
+        "bundleId": "com.microsoft.WarehouseManagement",
         "url": "https://itunes.apple.com/search?term=microsoft-warehouse-management&country=us&entity=software",
         "keys": common_keys
     },
@@ -98,18 +101,22 @@ apps = {
         "keys": common_keys
     },
     "iOS Microsoft Dynamics 365 Sales": {
+        "bundleId": "com.microsoft.dynamics.iphone.moca.sales",
         "url": "https://itunes.apple.com/search?term=dynamics-365-sales&country=us&entity=software",
         "keys": common_keys
     },
     "iOS Microsoft Lists": {
+        "bundleId": "com.microsoft.splists",
         "url": "https://itunes.apple.com/search?term=microsoft-lists&country=us&entity=software",
         "keys": common_keys
     },
     "iOS Microsoft Dynamics 365 Field Service": {
+        "bundleId": "com.microsoft.dynamics.iphone.moca.fieldServices",
         "url": "https://itunes.apple.com/search?term=dynamics-365-field-service&country=us&entity=software",
         "keys": common_keys
     },
     "iOS Microsoft Dynamics 365 Remote Assist": {
+        "bundleId": "com.microsoft.ramobile",
         "url": "https://itunes.apple.com/search?term=dynamics-365-remote-assist&country=us&entity=software",
         "keys": common_keys
     },
@@ -118,6 +125,7 @@ apps = {
         "keys": common_keys
     },
     "iOS Microsoft Viva Engage": {
+        "bundleId": "wefwef",
         "url": "https://itunes.apple.com/search?term=viva-engage&country=us&entity=software",
         "keys": common_keys
     },
@@ -126,94 +134,137 @@ apps = {
         "keys": common_keys
     },
     "iOS Microsoft Edge AI Browser": {
+        "bundleId": "com.microsoft.msedge",
         "url": "https://itunes.apple.com/search?term=edge-ai-browser&country=us&entity=software",
         "keys": common_keys
     },
     "iOS Microsoft Seeing AI": {
+        "bundleId": "com.microsoft.seeingai",
         "url": "https://itunes.apple.com/search?term=seeing-ai&country=us&entity=software",
         "keys": common_keys
     },
     "iOS Microsoft Planner": {
+        "bundleId": "com.microsoft.PlannerMobile",
         "url": "https://itunes.apple.com/search?term=microsoft-planner&country=us&entity=software",
         "keys": common_keys
     },
     "iOS Microsoft Azure": {
+        "bundleId": "com.microsoft.azure",
         "url": "https://itunes.apple.com/search?term=microsoft-azure&country=us&entity=software",
         "keys": common_keys
     },
     "iOS Microsoft To-Do": {
+        "bundleId": "com.microsoft.to-do",
         "url": "https://itunes.apple.com/search?term=microsoft-to-do&country=us&entity=software",
         "keys": common_keys
     },
     "iOS Microsoft Teams": {
+        "bundleId": "com.microsoft.skype.teams",
         "url": "https://itunes.apple.com/search?term=microsoft-teams&country=us&entity=software",
         "keys": common_keys
     },
     "iOS Microsoft Sharepoint": {
+        "bundleId": "com.microsoft.sharepoint",
         "url": "https://itunes.apple.com/search?term=microsoft-sharepoint&country=us&entity=software",
         "keys": common_keys
     },
     "iOS Microsoft Dynamics 365 Business Central": {
+        "bundleId": "com.microsoft.dynamics.ProjectMadeira",
         "url": "https://itunes.apple.com/search?term=dynamics-365-business-central&country=us&entity=software",
         "keys": common_keys
     },
     "iOS Microsoft Power Apps": {
+        "bundleId": "com.microsoft.msapps",
         "url": "https://itunes.apple.com/search?term=power-apps&country=us&entity=software",
         "keys": common_keys
     },
     "iOS Microsoft Authenticator": {
+        "bundleId": "com.microsoft.azureauthenticator",
         "url": "https://itunes.apple.com/search?term=microsoft-authenticator&country=us&entity=software",
         "keys": common_keys
     },
     "iOS Microsoft Advertising": {
+        "bundleId": "com.microsoft.bingadsmobile",
         "url": "https://itunes.apple.com/search?term=microsoft-advertising&country=us&entity=software",
         "keys": common_keys
     },
     "iOS Microsoft Lens PDF Scanner": {
+        "bundleId": "com.microsoft.officelens",
         "url": "https://itunes.apple.com/search?term=microsoft-lens-pdf-scanner&country=us&entity=software",
         "keys": common_keys
     },
     "iOS Microsoft Work Folders": {
+        "bundleId": "com.microsoft.workfolders",
         "url": "https://itunes.apple.com/search?term=work-folders&country=us&entity=software",
         "keys": common_keys
     },
     "iOS Microsoft Power BI": {
+        "bundleId": "com.microsoft.powerbimobile",
         "url": "https://itunes.apple.com/search?term=microsoft-power-bi&country=us&entity=software",
         "keys": common_keys
     },
     "iOS Microsoft 365 Admin": {
+        "bundleId": "com.microsoft.o365shdmobileapp",
         "url": "https://itunes.apple.com/search?term=microsoft-365-admin&country=us&entity=software",
         "keys": common_keys
     },
     "iOS Microsoft Intune Company Portal": {
+        "bundleId": "com.microsoft.CompanyPortal",
         "url": "https://itunes.apple.com/search?term=intune-company-portal&country=us&entity=software",
         "keys": common_keys
     },
     "iOS Microsoft Azure Information Protection": {
+        "bundleId": "com.microsoft.rms-sharing",
         "url": "https://itunes.apple.com/search?term=azure-information-protection&country=us&entity=software",
         "keys": common_keys
     },
     "iOS Microsoft 365 Office": {
+        "bundleId": "com.microsoft.officemobile",
         "url": "https://itunes.apple.com/search?term=microsoft-365-office&country=us&entity=software",
         "keys": common_keys
     },
     "iOS Microsoft Skype for Business": {
+        "bundleId": "com.microsoft.lync2013.iphone",
         "url": "https://itunes.apple.com/search?term=skype-for-business&country=us&entity=software",
         "keys": common_keys
     }
 }
 
-# Ensure the output directory exists
+# Output directory for the generated feeds
 output_dir = "latest_raw_files"
-os.makedirs(output_dir, exist_ok=True)
 
 def fetch_app_data(url):
     logging.info(f"Fetching data from {url}")
-    response = requests.get(url)
+    response = http_cache.fetch(url)
     data = response.json()
     # logging.info(f"Pulled data: {json.dumps(data, indent=4)}") # Uncomment to see the full JSON response
     return data['results'][0] if 'results' in data and len(data['results']) > 0 else {}
 
+# Apple's lookup API resolves many pinned bundle IDs in a single request
+lookup_url = "https://itunes.apple.com/lookup?bundleId={bundle_ids}&country=us"
+lookup_batch_size = 100
+
+def lookup_app_data(apps):
+    """
+    Resolve every app with a pinned bundleId through batched lookup requests.
+
+    Returns:
+        dict: Lookup results keyed by lowercase bundle ID.
+    """
+    bundle_ids = [app_info["bundleId"] for app_info in apps.values() if app_info.get("bundleId")]
+    results = {}
+    for start in range(0, len(bundle_ids), lookup_batch_size):
+        batch = bundle_ids[start:start + lookup_batch_size]
+        logging.info(f"Looking up {len(batch)} pinned bundle IDs")
+        try:
+            data = http_cache.fetch(lookup_url.format(bundle_ids=",".join(batch))).json()
+        except Exception as e:
+            logging.error(f"Error looking up bundle IDs, falling back to search: {e}")
+            continue
+        for result in data.get("results", []):
+            results[result.get("bundleId", "").lower()] = result
+    return results
+
 def format_date(date_str):
     try:
         date_obj = datetime.strptime(date_str, '%Y-%m-%dT%H:%M:%SZ')
@@ -221,99 +272,77 @@ def format_date(date_str):
     except ValueError:
         return date_str
 
-def create_xml(apps):
-    root = ET.Element("latest")
-    last_updated = ET.SubElement(root, "last_updated")
-    last_updated.text = get_current_date_time()
+def create_feed(apps):
+    feed = feed_model.Feed(
+        root_tag="latest",
+        timestamp_key="last_updated",
+        timestamp=get_current_date_time(),
+        package_tag="package",
+        packages_key="packages",
+        strip_values=True,
+    )
+
+    with run_report.stage("lookup"):
+        resolved_apps = lookup_app_data(apps)
 
     for app_name, app_info in apps.items():
         logging.info("-" * 50)  # Add dashes between each app
         logging.info(f"Processing {app_name}")
-        app_data = fetch_app_data(app_info["url"])
-        package = ET.SubElement(root, "package")
-        ET.SubElement(package, "name").text = app_name
+        app_data = resolved_apps.get(app_info.get("bundleId", "").lower())
+        if app_data is None:
+            # Only apps without a pinned or resolvable bundle ID fall back to search
+            with run_report.stage("search", app_name):
+                app_data = fetch_app_data(app_info["url"])
+        package = {"name": app_name}
         for key in ["application_name", "bundleId", "currentVersionReleaseDate", "icon_image", "minimumOsVersion", "releaseNotes", "version"]:
             json_key = app_info["keys"][key]
             value = app_data.get(json_key, "N/A")
             if key == "currentVersionReleaseDate" and value != "N/A":
                 value = format_date(value)
             logging.info(f"{key}: {value}")
-            ET.SubElement(package, key).text = value
-
-    # Convert to string and pretty print
-    xml_str = ET.tostring(root, encoding='utf-8')
-    dom = parseString(xml_str)
-    pretty_xml_as_string = dom.toprettyxml()
-
-    with open(os.path.join(output_dir, "ios_appstore_latest.xml"), "w", encoding="utf-8") as f:
-        f.write(pretty_xml_as_string)
+            package[key] = value
+        feed.add_package(package)
 
     logging.info("-" * 50)
-    logging.info(f"XML output generated at: {os.path.join(output_dir, 'ios_appstore_latest.xml')}")
-
-def xml_to_json_and_yaml(xml_file):
-    tree = ET.parse(xml_file)
-    root = tree.getroot()
-
-    def etree_to_dict(t):
-        d = {t.tag: {} if t.attrib else None}
-        children = list(t)
-        if children:
-            dd = defaultdict(list)
-            for dc in map(etree_to_dict, children):
-                for k, v in dc.items():
-                    dd[k].append(v)
-            d = {t.tag: {k: v[0] if len(v) == 1 else v for k, v in dd.items()}}
-        if t.attrib:
-            d[t.tag].update((k, v) for k, v in t.attrib.items())
-        if t.text:
-            text = t.text.strip()
-            if children or t.attrib:
-                if text:
-                    d[t.tag]['#text'] = text
-            else:
-                d[t.tag] = text
-        return d
+    return feed
 
-    data_dict = etree_to_dict(root)
+# Convert to YAML using PyYAML with indented package lists
+class OrderedDumper(yaml.Dumper):
+    def increase_indent(self, flow=False, indentless=False):
+        return super(OrderedDumper, self).increase_indent(flow, False)
 
-    # Reformat the data to match the desired structure
-    last_updated = data_dict['latest']['last_updated']
-    packages = []
-    for package in data_dict['latest']['package']:
-        package_data = OrderedDict()
-        package_data['name'] = package['name']
-        package_data['application_name'] = package['application_name']
-        package_data['bundleId'] = package['bundleId']
-        package_data['currentVersionReleaseDate'] = package['currentVersionReleaseDate']
-        package_data['icon_image'] = package['icon_image']
-        package_data['minimumOsVersion'] = package['minimumOsVersion']
-        package_data['releaseNotes'] = package['releaseNotes']
-        package_data['version'] = package['version']
-        packages.append(package_data)
+def write_outputs(feed):
+    # Build the JSON and YAML data directly from the in-memory feed, in the same order as XML
+    output_data = feed.to_dict()
 
-    output_data = OrderedDict()
-    output_data['last_updated'] = last_updated
-    output_data['packages'] = packages
+    # Write the XML, JSON, YAML and binary files together as one snapshot
+    with run_report.stage("write_outputs"):
+        feed.write_outputs(
+            os.path.join(output_dir, "ios_appstore_latest.xml"),
+            os.path.join(output_dir, "ios_appstore_latest.json"),
+            os.path.join(output_dir, "ios_appstore_latest.yaml"),
+            data=output_data,
+            dumper=OrderedDumper,
+            binary_path=os.path.join(output_dir, "ios_appstore_latest.cbor"),
+        )
 
-    # Convert to JSON
-    with open(os.path.join(output_dir, "ios_appstore_latest.json"), "w", encoding="utf-8") as json_file:
-        json.dump(output_data, json_file, indent=4)
-    logging.info(f"JSON output generated at: {os.path.join(output_dir, 'ios_appstore_latest.json')}")
+    return output_data
 
-    # Convert to YAML using PyYAML with OrderedDict
-    class OrderedDumper(yaml.Dumper):
-        def increase_indent(self, flow=False, indentless=False):
-            return super(OrderedDumper, self).increase_indent(flow, False)
+@run_report.run("ios_appstore_latest")
+def main():
+    """
+    Build the iOS App Store feed and write its XML, YAML and JSON outputs.
 
-    def dict_representer(dumper, data):
-        return dumper.represent_dict(data.items())
+    Returns:
+        dict: The feed data that was written, as saved to the YAML and JSON files.
+    """
+    logging.info(f"Current date and time: {get_current_date_time()}")
 
-    yaml.add_representer(OrderedDict, dict_representer, Dumper=OrderedDumper)
+    # Ensure the output directory exists
+    os.makedirs(output_dir, exist_ok=True)
 
-    with open(os.path.join(output_dir, "ios_appstore_latest.yaml"), "w", encoding="utf-8") as yaml_file:
-        yaml.dump(output_data, yaml_file, Dumper=OrderedDumper, default_flow_style=False, sort_keys=False)
-    logging.info(f"YAML output generated at: {os.path.join(output_dir, 'ios_appstore_latest.yaml')}")
+    feed = create_feed(apps)
+    return write_outputs(feed)
 
-create_xml(apps)
-xml_to_json_and_yaml(os.path.join(output_dir, "ios_appstore_latest.xml"))
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,11 @@
-import requests
-import json
-import xml.etree.ElementTree as ET
+import http_cache
 from datetime import datetime
 import logging
-from xml.dom.minidom import parseString
 import pytz
 import yaml
-from collections import defaultdict, OrderedDict
 import os
+import feed_model
+import run_report
 
 # Configure logging with a cleaner and more human-readable format
 logging.basicConfig(
@@ -32,10 +30,6 @@ def get_current_date_time():
 
     return formatted_date_time
 
-# Call the function to test it
-last_update_date_time = get_current_date_time()
-logging.info(f"Current date and time: {last_update_date_time}")
-
 # Define common keys
 common_keys = {
     "application_name": "trackName",
@@ -50,54 +44,87 @@ common_keys = {
 # Define app-specific configurations
 apps = {
     "MacOS Microsoft Word": {
+        "bundleId": "com.microsoft.Word",
         "url": "https://itunes.apple.com/search?term=microsoft-word&country=us&entity=macSoftware",
         "keys": common_keys
     },
     "MacOS Microsoft Excel": {
+        "bundleId": "com.microsoft.Excel",
         "url": "https://itunes.apple.com/search?term=microsoft-excel&country=us&entity=macSoftware",
         "keys": common_keys
     },
     "MacOS Microsoft PowerPoint": {
+        "bundleId": "com.microsoft.Powerpoint",
         "url": "https://itunes.apple.com/search?term=microsoft-powerpoint&country=us&entity=macSoftware",
         "keys": common_keys
     },
     "MacOS Microsoft Outlook": {
+        "bundleId": "com.microsoft.Outlook",
         "url": "https://itunes.apple.com/search?term=microsoft-outlook&country=us&entity=macSoftware",
         "keys": common_keys
     },
     "MacOS Microsoft OneNote": {
+        "bundleId": "com.microsoft.onenote.mac",
         "url": "https://itunes.apple.com/search?term=microsoft-onenote&country=us&entity=macSoftware",
         "keys": common_keys
     },
     "MacOS Microsoft OneDrive": {
+        "bundleId": "com.microsoft.OneDrive-mac",
         "url": "https://itunes.apple.com/search?term=microsoft-onedrive&country=us&entity=macSoftware",
         "keys": common_keys
     },
     "MacOS Microsoft Windows App": {
+        "bundleId": "com.microsoft.rdc.macos",
         "url": "https://itunes.apple.com/search?term=windows-app&country=us&entity=macSoftware",
         "keys": common_keys
     },
     "MacOS Microsoft To-Do": {
+        "bundleId": "com.microsoft.to-do-mac",
         "url": "https://itunes.apple.com/search?term=microsoft-to-do&country=us&entity=macSoftware",
         "keys": common_keys
     },
     "MacOS Microsoft Azure VPN Client": {
+        "bundleId": "com.microsoft.AzureVpnMac",
         "url": "https://itunes.apple.com/search?term=azure-vpn-client&country=us&entity=macSoftware",
         "keys": common_keys
     }
 }
 
-# Ensure the output directory exists
+# Output directory for the generated feeds
 output_dir = "latest_raw_files"
-os.makedirs(output_dir, exist_ok=True)
 
 def fetch_app_data(url):
     logging.info(f"Fetching data from {url}")
-    response = requests.get(url)
+    response = http_cache.fetch(url)
     data = response.json()
     # logging.info(f"Pulled data: {json.dumps(data, indent=4)}")  # Comment out or remove this line to hide JSON URL output
     return data['results'][0] if 'results' in data and len(data['results']) > 0 else {}
 
+# Apple's lookup API resolves many pinned bundle IDs in a single request
+lookup_url = "https://itunes.apple.com/lookup?bundleId={bundle_ids}&country=us"
+lookup_batch_size = 100
+
+def lookup_app_data(apps):
+    """
+    Resolve every app with a pinned bundleId through batched lookup requests.
+
+    Returns:
+        dict: Lookup results keyed by lowercase bundle ID.
+    """
+    bundle_ids = [app_info["bundleId"] for app_info in apps.values() if app_info.get("bundleId")]
+    results = {}
+    for start in range(0, len(bundle_ids), lookup_batch_size):
+        batch = bundle_ids[start:start + lookup_batch_size]
+        logging.info(f"Looking up {len(batch)} pinned bundle IDs")
+        try:
+            data = http_cache.fetch(lookup_url.format(bundle_ids=",".join(batch))).json()
+        except Exception as e:
+            logging.error(f"Error looking up bundle IDs, falling back to search: {e}")
+            continue
+        for result in data.get("results", []):
+            results[result.get("bundleId", "").lower()] = result
+    return results
+
 def format_date(date_str):
     try:
         date_obj = datetime.strptime(date_str, '%Y-%m-%dT%H:%M:%SZ')
@@ -105,99 +132,77 @@ def format_date(date_str):
     except ValueError:
         return date_str
 
-def create_xml(apps):
-    root = ET.Element("latest")
-    last_updated = ET.SubElement(root, "last_updated")
-    last_updated.text = get_current_date_time()
+def create_feed(apps):
+    feed = feed_model.Feed(
+        root_tag="latest",
+        timestamp_key="last_updated",
+        timestamp=get_current_date_time(),
+        package_tag="package",
+        packages_key="packages",
+        strip_values=True,
+    )
+
+    with run_report.stage("lookup"):
+        resolved_apps = lookup_app_data(apps)
 
     for app_name, app_info in apps.items():
         logging.info("-" * 50)
         logging.info(f"Processing {app_name}")
-        app_data = fetch_app_data(app_info["url"])
-        package = ET.SubElement(root, "package")
-        ET.SubElement(package, "name").text = app_name
+        app_data = resolved_apps.get(app_info.get("bundleId", "").lower())
+        if app_data is None:
+            # Only apps without a pinned or resolvable bundle ID fall back to search
+            with run_report.stage("search", app_name):
+                app_data = fetch_app_data(app_info["url"])
+        package = {"name": app_name}
         for key in ["application_name", "bundleId", "currentVersionReleaseDate", "icon_image", "minimumOsVersion", "releaseNotes", "version"]:
             json_key = app_info["keys"][key]
             value = app_data.get(json_key, "N/A")
             if key == "currentVersionReleaseDate" and value != "N/A":
                 value = format_date(value)
             logging.info(f"{key}: {value}")
-            ET.SubElement(package, key).text = value
+            package[key] = value
+        feed.add_package(package)
 
-    # Convert to string and pretty print
-    xml_str = ET.tostring(root, encoding='utf-8')
-    dom = parseString(xml_str)
-    pretty_xml_as_string = dom.toprettyxml()
+    logging.info("-" * 50)
+    return feed
+
+# Convert to YAML using PyYAML with indented package lists
+class OrderedDumper(yaml.Dumper):
+    def increase_indent(self, flow=False, indentless=False):
+        return super(OrderedDumper, self).increase_indent(flow, False)
+
+def write_outputs(feed):
+    # Build the JSON and YAML data directly from the in-memory feed, in the same order as XML
+    output_data = feed.to_dict()
+
+    # Write the XML, JSON, YAML and binary files together as one snapshot
+    with run_report.stage("write_outputs"):
+        feed.write_outputs(
+            os.path.join(output_dir, "macos_appstore_latest.xml"),
+            os.path.join(output_dir, "macos_appstore_latest.json"),
+            os.path.join(output_dir, "macos_appstore_latest.yaml"),
+            data=output_data,
+            dumper=OrderedDumper,
+            binary_path=os.path.join(output_dir, "macos_appstore_latest.cbor"),
+        )
+
+    return output_data
+
+@run_report.run("macos_appstore_latest")
+def main():
+    """
+    Build the macOS App Store feed and write its XML, YAML and JSON outputs.
 
-    with open(os.path.join(output_dir, "macos_appstore_latest.xml"), "w", encoding="utf-8") as f:
-        f.write(pretty_xml_as_string)
+    Returns:
+        dict: The feed data that was written, as saved to the YAML and JSON files.
+    """
+    logging.info(f"Current date and time: {get_current_date_time()}")
 
-    logging.info("-" * 50)
-    logging.info(f"XML output generated at: {os.path.join(output_dir, 'macos_appstore_latest.xml')}")
-
-def xml_to_json_and_yaml(xml_file):
-    tree = ET.parse(xml_file)
-    root = tree.getroot()
-
-    def etree_to_dict(t):
-        d = {t.tag: {} if t.attrib else None}
-        children = list(t)
-        if children:
-            dd = defaultdict(list)
-            for dc in map(etree_to_dict, children):
-                for k, v in dc.items():
-                    dd[k].append(v)
-            d = {t.tag: {k: v[0] if len(v) == 1 else v for k, v in dd.items()}}
-        if t.attrib:
-            d[t.tag].update((k, v) for k, v in t.attrib.items())
-        if t.text:
-            text = t.text.strip()
-            if children or t.attrib:
-                if text:
-                    d[t.tag]['#text'] = text
-            else:
-                d[t.tag] = text
-        return d
-
-    data_dict = etree_to_dict(root)
-
-    # Reformat the data to match the desired structure
-    last_updated = data_dict['latest']['last_updated']
-    packages = []
-    for package in data_dict['latest']['package']:
-        package_data = OrderedDict()
-        package_data['name'] = package['name']
-        package_data['application_name'] = package['application_name']
-        package_data['bundleId'] = package['bundleId']
-        package_data['currentVersionReleaseDate'] = package['currentVersionReleaseDate']
-        package_data['icon_image'] = package['icon_image']
-        package_data['minimumOsVersion'] = package['minimumOsVersion']
-        package_data['releaseNotes'] = package['releaseNotes']
-        package_data['version'] = package['version']
-        packages.append(package_data)
-
-    output_data = OrderedDict()
-    output_data['last_updated'] = last_updated
-    output_data['packages'] = packages
-
-    # Convert to JSON
-    with open(os.path.join(output_dir, "macos_appstore_latest.json"), "w", encoding="utf-8") as json_file:
-        json.dump(output_data, json_file, indent=4)
-    logging.info(f"JSON output generated at: {os.path.join(output_dir, 'macos_appstore_latest.json')}")
-
-    # Convert to YAML using PyYAML with OrderedDict
-    class OrderedDumper(yaml.Dumper):
-        def increase_indent(self, flow=False, indentless=False):
-            return super(OrderedDumper, self).increase_indent(flow, False)
-
-    def dict_representer(dumper, data):
-        return dumper.represent_dict(data.items())
-
-    yaml.add_representer(OrderedDict, dict_representer, Dumper=OrderedDumper)
-
-    with open(os.path.join(output_dir, "macos_appstore_latest.yaml"), "w", encoding="utf-8") as yaml_file:
-        yaml.dump(output_data, yaml_file, Dumper=OrderedDumper, default_flow_style=False, sort_keys=False)
-    logging.info(f"YAML output generated at: {os.path.join(output_dir, 'macos_appstore_latest.yaml')}")
-
-create_xml(apps)
-xml_to_json_and_yaml(os.path.join(output_dir, "macos_appstore_latest.xml"))
+    # Ensure the output directory exists
+    os.makedirs(output_dir, exist_ok=True)
+
+    feed = create_feed(apps)
+    return write_outputs(feed)
+
+if __name__ == "__main__":
+    main()
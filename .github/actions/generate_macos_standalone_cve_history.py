@@ -1,13 +1,17 @@
-from bs4 import BeautifulSoup
-import requests
+import http_session
+import page_parser
 import xml.etree.ElementTree as ET
-from xml.dom import minidom
+import xml_writer
+import output_stage
+import binary_feed
+import run_report
 import logging
 from datetime import datetime
 import pytz
 import json
 import yaml
 import os
+import io
 
 # Configure logging with a cleaner and more human-readable format
 logging.basicConfig(
@@ -18,157 +22,263 @@ logging.basicConfig(
 
 url = 'https://learn.microsoft.com/en-us/officeupdates/release-notes-office-for-mac'  # URL to fetch HTML data
 
-# Fetch the HTML content
-logging.info('Fetching HTML content from URL: %s', url)
-response = requests.get(url)
-html_data = response.text
-logging.info('HTML content fetched successfully')
+# Text of the release-notes section that stops the history
+stop_date = "December 10, 2019"
 
-# Parse the HTML content
-logging.info('Parsing HTML content')
-soup = BeautifulSoup(html_data, 'html.parser')
+json_output_file = 'latest_raw_files/mac_standalone_cve_history.json'
+binary_output_file = 'latest_raw_files/mac_standalone_cve_history.cbor'
 
-# Initialize an empty list to store parsed data
-parsed_data = []
+# Set MOFA_FULL_HISTORY=1 to re-parse every section instead of only those newer than the existing history
+full_history = os.environ.get("MOFA_FULL_HISTORY", "0") == "1"
 
-# Loop through each <h2> to get the date and version info
-for h2 in soup.find_all('h2'):
-    # Get the h2 id (the date)
-    date_id = h2.get('id', '')
-    date_text = h2.get_text(strip=True)
+def load_existing_history(file_path):
+    """
+    Load the sections recorded by a previous run from the JSON history.
 
-    # Skip if the date is not a valid date
+    Returns:
+        list: The recorded sections, newest first, or an empty list if there is no usable history.
+    """
     try:
-        datetime.strptime(date_text, '%B %d, %Y')
-    except ValueError:
-        logging.warning('Skipping invalid date: %s', date_text)
-        continue
-
-    # Stop if the date is January 14, 2020
-    if date_text == "December 10, 2019":
-        logging.info('Reached the stopping date: %s', date_text)
-        break
-
-    # Get the version (inside <em> tag after h2)
-    em_tag = h2.find_next('em')
-    version = em_tag.get_text(strip=True) if em_tag else None
-
-    # Initialize a dictionary to store data for this section
-    section_data = {
-        'date_text': date_text,
-        'version': version,
-        'security_updates': {}
-    }
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('updates', [])
+    except (OSError, ValueError, AttributeError) as e:
+        logging.info('No existing CVE history loaded from %s: %s', file_path, e)
+        return []
+
+def merge_history(new_sections, existing_sections):
+    """
+    Put newly parsed sections in front of the recorded history. A recorded section that
+    was parsed again is replaced by its new version.
+
+    Returns:
+        list: The merged sections, newest first.
+    """
+    new_dates = {section['date_text'] for section in new_sections}
+    return new_sections + [section for section in existing_sections if section['date_text'] not in new_dates]
+
+def is_security_heading(h3):
+    return 'security updates' in h3.get_text(strip=True).lower()
+
+def parse_release_notes(soup, recorded=None):
+    """
+    Segment the release notes into date sections and their security-update subsections
+    in a single forward pass over the document's <h2>, <h3>, <em> and <ul> elements.
+
+    Parsing stops at the stop date, or, when recorded is given, at the second section
+    already recorded with the same date and version, so later runs only parse new releases
+    and the newest recorded one. That section is parsed again because CVEs are often added
+    to the latest release notes after they are published; CVEs added to older sections are
+    only picked up by a full parse (MOFA_FULL_HISTORY=1).
+
+    A section runs from a dated <h2> to the next <h2>. Its version is the first <em>
+    after the <h2>. The application headings of a "Security updates" <h3> are its
+    following sibling <h3>s up to the next "Security updates" heading or the end of the
+    section, and each application's CVEs are the links in the first <ul> after it.
+
+    Args:
+        recorded (dict): Date text -> version of the sections already in the history.
+
+    Returns:
+        list: One dict per dated section, in page order, with date_text, version and
+        security_updates.
+    """
+    recorded = recorded or {}
+    sections = []            # Per dated section: its data and its "Security updates" collectors
+    open_collectors = {}     # Parent element id -> collector still accepting sibling headings
+    pending_versions = []    # Sections still waiting for their first <em>
+    pending_apps = []        # Application headings still waiting for their first <ul>
+    app_links = {}           # Application heading id -> links of its <ul>
+    current = None
+    stopped_at = None
+    head_seen = False        # Whether the newest recorded section was reached
 
-    # Loop through all subsequent h3 tags after h2
-    for h3 in h2.find_all_next('h3'):
-        # Stop if we reach another <h2> (this means the current section ends)
-        if h3.find_previous('h2') != h2:
-            break
-
-        # Check if the <h3> contains 'security updates' in the title (not the id)
-        if 'security updates' in h3.get_text(strip=True).lower():
-            # Loop through the next h3 tags for application names
-            next_h3 = h3.find_next_siblings('h3')
-            for app_h3 in next_h3:
-                # Stop at the next "security updates" or another <h2>
-                if 'security updates' in app_h3.get_text(strip=True).lower() or app_h3.find_previous('h2') != h2:
-                    break
+    # Walk the tags lazily so stopping early also skips the rest of the document
+    tags = ('h2', 'h3', 'em', 'ul')
+    for element in (el for el in soup.descendants if el.name in tags):
+        if element.name == 'h2':
+            # Every <h2> ends the current section, dated or not
+            current = None
+            open_collectors.clear()
 
+            date_text = element.get_text(strip=True)
+
+            # Skip if the date is not a valid date
+            try:
+                datetime.strptime(date_text, '%B %d, %Y')
+            except ValueError:
+                logging.warning('Skipping invalid date: %s', date_text)
+                continue
+
+            # Stop at the oldest section we track
+            if date_text == stop_date:
+                logging.info('Reached the stopping date: %s', date_text)
+                stopped_at = element
+                break
+
+            # Parse the newest section that is already recorded and unchanged once more,
+            # and stop at the next one
+            if date_text in recorded:
+                em_tag = element.find_next('em')
+                if em_tag and em_tag.get_text(strip=True) == recorded[date_text]:
+                    if head_seen:
+                        logging.info('Reached the older recorded sections: %s', date_text)
+                        stopped_at = element
+                        break
+                    logging.info('Parsing the newest recorded section again: %s', date_text)
+                    head_seen = True
+
+            current = {
+                'data': {'date_text': date_text, 'version': None, 'security_updates': {}},
+                'collectors': []
+            }
+            sections.append(current)
+            pending_versions.append(current['data'])
+
+        elif element.name == 'em':
+            # The version is inside the first <em> tag after each h2
+            version = element.get_text(strip=True)
+            for section_data in pending_versions:
+                section_data['version'] = version
+            pending_versions.clear()
+
+        elif element.name == 'ul':
+            # The CVE links for an application are in the first <ul> after its heading
+            if pending_apps:
+                links = element.find_all('a')
+                for app_h3 in pending_apps:
+                    app_links[id(app_h3)] = links
+                pending_apps.clear()
+
+        elif current is not None:
+            parent = id(element.parent)
+            if is_security_heading(element):
+                # A "Security updates" heading closes its siblings' list and starts its own
+                collector = []
+                current['collectors'].append(collector)
+                open_collectors[parent] = collector
+            elif parent in open_collectors:
                 # Extract the application name (e.g., Excel, Word)
-                app_name = app_h3.get_text(strip=True)
-
-                # Find the <ul> element containing the CVE links for this app
-                ul_tag = app_h3.find_next('ul')
-                if ul_tag:
-                    # Get all the links in the <ul>
-                    links = ul_tag.find_all('a')
-                    for link in links:
-                        url = link['href']
-                        cve_name = link.get_text(strip=True)
-
-                        # Store CVE updates grouped by application
-                        if app_name not in section_data['security_updates']:
-                            section_data['security_updates'][app_name] = []
-
-                        section_data['security_updates'][app_name].append({
-                            'cve_name': cve_name,
-                            'url': url
-                        })
-
-    # If no security updates were found, add a placeholder
-    if not section_data['security_updates']:
-        section_data['security_updates'] = {'N/A': [{'cve_name': 'N/A', 'url': None}]}
-
-    parsed_data.append(section_data)
-    logging.info('Parsed data for date: %s', date_text)
-
-# Create the root element for the XML
-root = ET.Element('Updates')
-
-# Add the last scan date at the top
-last_scan_date = datetime.now(pytz.timezone('US/Eastern')).strftime('%B %d, %Y %I:%M %p %Z')
-last_scan_elem = ET.SubElement(root, 'last_scan_date')
-last_scan_elem.text = last_scan_date
-
-# Add last_scan_date to parsed_data
-parsed_data_with_date = {
-    'last_scan_date': last_scan_date,
-    'updates': parsed_data
-}
-
-# Loop through each section and build the XML structure
-for section in parsed_data:
-    update_elem = ET.SubElement(root, 'Update')
-    date_elem = ET.SubElement(update_elem, 'Date')
-    date_elem.text = section['date_text']
-    version_elem = ET.SubElement(update_elem, 'Version')
-    version_elem.text = section['version']
-
-    security_updates_elem = ET.SubElement(update_elem, 'SecurityUpdates')
-    if section['security_updates'] == {'N/A': [{'cve_name': 'N/A', 'url': None}]}:
-        application_elem = ET.SubElement(security_updates_elem, 'Application')
-        name_elem = ET.SubElement(application_elem, 'Name')
-        name_elem.text = 'N/A'
-        cve_elem = ET.SubElement(application_elem, 'CVE')
-        cve_elem.text = 'N/A'
-        url_elem = ET.SubElement(application_elem, 'URL')
-        url_elem.text = 'N/A'
-    else:
-        for app_name, updates in section['security_updates'].items():
+                open_collectors[parent].append((element, element.get_text(strip=True)))
+                pending_apps.append(element)
+
+    # Headings still waiting at the stop date take the first <ul> or <em> after it
+    if stopped_at is not None and pending_apps:
+        ul_tag = stopped_at.find_next('ul')
+        links = ul_tag.find_all('a') if ul_tag else []
+        for app_h3 in pending_apps:
+            app_links[id(app_h3)] = links
+    if stopped_at is not None and pending_versions:
+        em_tag = stopped_at.find_next('em')
+        for section_data in pending_versions:
+            section_data['version'] = em_tag.get_text(strip=True) if em_tag else None
+
+    parsed_data = []
+    for section in sections:
+        section_data = section['data']
+        for collector in section['collectors']:
+            for app_h3, app_name in collector:
+                for link in app_links.get(id(app_h3), []):
+                    cve_url = link['href']
+                    cve_name = link.get_text(strip=True)
+
+                    # Store CVE updates grouped by application
+                    section_data['security_updates'].setdefault(app_name, []).append({
+                        'cve_name': cve_name,
+                        'url': cve_url
+                    })
+
+        # If no security updates were found, add a placeholder
+        if not section_data['security_updates']:
+            section_data['security_updates'] = {'N/A': [{'cve_name': 'N/A', 'url': None}]}
+
+        parsed_data.append(section_data)
+        logging.info('Parsed data for date: %s', section_data['date_text'])
+
+    return parsed_data
+
+@run_report.run('macos_standalone_cve_history')
+def main():
+    """
+    Scrape the Office for Mac release notes and write the CVE history as XML, JSON and YAML.
+
+    Returns:
+        dict: The CVE history that was written, as saved to the JSON and YAML files.
+    """
+    # Fetch the HTML content
+    logging.info('Fetching HTML content from URL: %s', url)
+    with run_report.stage('fetch_page'):
+        response = http_session.get(url)
+        response.raise_for_status()
+        html_data = response.text
+    logging.info('HTML content fetched successfully')
+
+    # Parse the main content of the page
+    logging.info('Parsing HTML content')
+    with run_report.stage('parse_page'):
+        soup = page_parser.parse(html_data, only='main')
+
+        existing_data = [] if full_history else load_existing_history(json_output_file)
+        recorded = {section['date_text']: section['version'] for section in existing_data}
+        new_data = parse_release_notes(soup, recorded)
+    logging.info('Parsed %d new or changed sections', len(new_data))
+    parsed_data = merge_history(new_data, existing_data)
+
+    # Create the root element for the XML
+    root = ET.Element('Updates')
+
+    # Add the last scan date at the top
+    last_scan_date = datetime.now(pytz.timezone('US/Eastern')).strftime('%B %d, %Y %I:%M %p %Z')
+    last_scan_elem = ET.SubElement(root, 'last_scan_date')
+    last_scan_elem.text = last_scan_date
+
+    # Add last_scan_date to parsed_data
+    parsed_data_with_date = {
+        'last_scan_date': last_scan_date,
+        'updates': parsed_data
+    }
+
+    # Loop through each section and build the XML structure
+    for section in parsed_data:
+        update_elem = ET.SubElement(root, 'Update')
+        date_elem = ET.SubElement(update_elem, 'Date')
+        date_elem.text = section['date_text']
+        version_elem = ET.SubElement(update_elem, 'Version')
+        version_elem.text = section['version']
+
+        security_updates_elem = ET.SubElement(update_elem, 'SecurityUpdates')
+        if section['security_updates'] == {'N/A': [{'cve_name': 'N/A', 'url': None}]}:
             application_elem = ET.SubElement(security_updates_elem, 'Application')
             name_elem = ET.SubElement(application_elem, 'Name')
-            name_elem.text = app_name
-            for update in updates:
-                cve_elem = ET.SubElement(application_elem, 'CVE')
-                cve_elem.text = update['cve_name']
-                url_elem = ET.SubElement(application_elem, 'URL')
-                url_elem.text = update['url'] if update['url'] else 'N/A'
-
-# Convert the XML tree to a string
-xml_str = ET.tostring(root, encoding='utf-8')
-
-# Pretty print the XML
-pretty_xml_str = minidom.parseString(xml_str).toprettyxml(indent="    ")
-
-# Write the pretty XML to a file
-output_file = 'latest_raw_files/mac_standalone_cve_history.xml'
-with open(output_file, 'w') as f:
-    f.write(pretty_xml_str)
-logging.info('XML data written to file: %s', output_file)
-
-# Ensure the JSON file is deleted before writing new data
-json_output_file = 'latest_raw_files/mac_standalone_cve_history.json'
-if os.path.exists(json_output_file):
-    os.remove(json_output_file)
-with open(json_output_file, 'w') as f:
-    json.dump(parsed_data_with_date, f, indent=4)
-logging.info('JSON data written to file: %s', json_output_file)
-
-# Ensure the YAML file is deleted before writing new data
-yaml_output_file = 'latest_raw_files/mac_standalone_cve_history.yaml'
-if os.path.exists(yaml_output_file):
-    os.remove(yaml_output_file)
-with open(yaml_output_file, 'w') as f:
-    yaml.dump(parsed_data_with_date, f, default_flow_style=False)
-logging.info('YAML data written to file: %s', yaml_output_file)
+            name_elem.text = 'N/A'
+            cve_elem = ET.SubElement(application_elem, 'CVE')
+            cve_elem.text = 'N/A'
+            url_elem = ET.SubElement(application_elem, 'URL')
+            url_elem.text = 'N/A'
+        else:
+            for app_name, updates in section['security_updates'].items():
+                application_elem = ET.SubElement(security_updates_elem, 'Application')
+                name_elem = ET.SubElement(application_elem, 'Name')
+                name_elem.text = app_name
+                for update in updates:
+                    cve_elem = ET.SubElement(application_elem, 'CVE')
+                    cve_elem.text = update['cve_name']
+                    url_elem = ET.SubElement(application_elem, 'URL')
+                    url_elem.text = update['url'] if update['url'] else 'N/A'
+
+    # Write the XML, JSON, YAML and binary files together as one snapshot, skipping any whose content did not change
+    output_file = 'latest_raw_files/mac_standalone_cve_history.xml'
+    yaml_output_file = 'latest_raw_files/mac_standalone_cve_history.yaml'
+    with run_report.stage('write_outputs'):
+        xml_buffer = io.StringIO()
+        xml_writer.write_pretty_xml(root, xml_buffer, indent="    ")
+        output_stage.write_outputs({
+            output_file: xml_buffer.getvalue(),
+            json_output_file: json.dumps(parsed_data_with_date, indent=4),
+            yaml_output_file: yaml.dump(parsed_data_with_date, default_flow_style=False),
+            binary_output_file: binary_feed.encode(parsed_data_with_date),
+        })
+
+    return parsed_data_with_date
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,22 @@
 import os
-import requests
-import xml.etree.ElementTree as ET
-from hashlib import sha256, sha1
-from xml.dom import minidom
+import io
+import hashlib
 import json
+import xml.etree.ElementTree as ET
 from datetime import datetime
 import time
 import pytz
 import re
-import yaml
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import http_cache
+import hash_ledger
+import range_download
+import url_resolver
+import feed_model
+import run_report
 
 # Configure logging with a cleaner and more human-readable format
 logging.basicConfig(
@@ -34,10 +41,6 @@ def get_current_date_time():
 
     return formatted_date_time
 
-# Call the function to test it
-last_update_date_time = get_current_date_time()
-logging.info(f"Current date and time: {last_update_date_time}")
-
 # Define app-specific configurations
 apps = {
     "Microsoft Office Suite": {
@@ -379,16 +382,6 @@ apps = {
     }
 }
 
-# Capture the current last update date and time
-last_update_date_time = get_current_date_time()
-
-# Initialize root element for combined XML
-root = ET.Element("latest")
-
-# Add the last update date and time element to the XML
-last_update_element = ET.SubElement(root, "last_updated")
-last_update_element.text = last_update_date_time  # Value from get_current_date_time()
-
 # Function to read existing XML data from macos_standalone_latest.xml
 def read_existing_xml(filename):
     if not os.path.exists(filename):
@@ -416,34 +409,122 @@ def read_existing_xml(filename):
         logging.error(f"Error reading existing XML from {filename}: {e}")
         return {}
 
-# Read existing data from macos_standalone_latest.xml
-existing_data = read_existing_xml("latest_raw_files/macos_standalone_latest.xml")
+# Maximum number of feed requests in flight at once, overall and per host
+max_in_flight = int(os.environ.get("MOFA_MAX_IN_FLIGHT", "8"))
+max_per_host = int(os.environ.get("MOFA_MAX_PER_HOST", "4"))
+
+# Function to parse a feed body into the data the extractors read. XML feeds are kept
+# as bytes: each app streams only the keys it needs out of them
+def parse_feed(feed):
+    # Check if the response is in JSON format
+    if feed.content_type.startswith('application/json'):
+        return "json", feed.json()
+
+    # logging.info(f"XML data: {feed.content.decode('utf8')}") # Uncomment to view XML data
+    return "xml", feed.content
+
+# Function to fetch a single feed while holding its host's slot, then parse it once.
+# Feeds that are unchanged since the last run (HTTP 304) are not parsed here.
+def fetch_feed(url, host_slot):
+    with run_report.stage("fetch_feed"), host_slot:
+        feed = http_cache.fetch(url, allow_redirects=True)
+
+    logging.info(f"Response status code for {url}: {feed.status_code}")
+
+    if feed.not_modified:
+        return feed, None
+    return feed, parse_feed(feed)
+
+# Per-run feed cache: each distinct URL is fetched once, and every app that
+# references it shares the same pending result (including while the request is in flight)
+class FeedCache:
+    def __init__(self, executor):
+        self.executor = executor
+        self.lock = threading.Lock()
+        self.host_slots = {}
+        self.pending_feeds = {}
+
+    def get(self, url):
+        with self.lock:
+            if url in self.pending_feeds:
+                logging.info(f"Reusing cached feed for {url}")
+            else:
+                host = urlparse(url).netloc
+                host_slot = self.host_slots.setdefault(host, threading.BoundedSemaphore(max_per_host))
+                self.pending_feeds[url] = self.executor.submit(run_report.bind(fetch_feed), url, host_slot)
+            return self.pending_feeds[url]
+
+# Set MOFA_PRECHECK=0 to always parse every feed instead of first comparing it with the existing entry
+precheck = os.environ.get("MOFA_PRECHECK", "1") == "1"
+
+# Digest of the feed body each published entry was built from. It is only used by the
+# pre-check, so it is kept out of the published outputs
+feed_digests_file = os.environ.get("MOFA_FEED_DIGESTS", ".cache/feed_digests.json")
+
+# Function to load the feed digests recorded by the last run that published its outputs
+def load_feed_digests():
+    try:
+        with open(feed_digests_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+# Function to record the feed digests once the outputs built from them are published
+def save_feed_digests(digests):
+    os.makedirs(os.path.dirname(feed_digests_file) or ".", exist_ok=True)
+    temp_file = f"{feed_digests_file}.tmp"
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(digests, f, indent=4, sort_keys=True)
+    os.replace(temp_file, feed_digests_file)
+
+# Function to check whether a download link still resolves to the same package as the existing entry
+def same_download(download_fields, existing_app_data):
+    return all(download_fields[key] == existing_app_data.get(key, "N/A") for key in download_fields)
 
 # Function to fetch and process an app's data (either XML or JSON)
-def fetch_and_process(app_name, config):
+def fetch_and_process(app_name, config, pending_feed):
     try:
         logging.info("-" * 50)
         logging.info(f"Fetching data for {app_name} from {config['url']}...")
-        response = requests.get(config["url"], allow_redirects=True)
-        response.raise_for_status()
-
-        logging.info(f"Response status code: {response.status_code}")
-        # logging.info(f"Response headers: {response.headers}") # Uncomment to view response headers
-
-        # Check if the response is in JSON format
-        if response.headers['Content-Type'].startswith('application/json'):
-            app_data = response.json()
-            logging.info(f"JSON data: {app_data}")
-            extracted_data = process_json_data(app_data, config)
-        else:
-            app_root = ET.fromstring(response.content)
-            app_data = app_root.find(".//dict")
-            # logging.info(f"XML data: {ET.tostring(app_root, encoding='utf8').decode('utf8')}") # Uncomment to view XML data
-            extracted_data = process_xml_data(app_data, config)
+        feed, parsed_feed = pending_feed.result()
+        feed_digest = hashlib.sha256(feed.content).hexdigest()
+
+        # Pre-check: an unchanged feed (same body digest as the existing entry) needs no
+        # parsing or hashing when the existing entry is already complete and its download
+        # link still points at the same package. A 304 alone is not enough: the HTTP cache
+        # keeps bodies from runs that failed before publishing, so only the digest recorded
+        # after the entry was published proves the entry was built from this body.
+        if precheck and app_name in existing_data:
+            existing_app_data = existing_data[app_name]["data"]
+            if feed_digest == feed_digests.get(app_name):
+                download_fields = url_resolver.download_fields(existing_app_data.get("latest_download"), fallback=existing_app_data)
+                if all(existing_app_data.get(a, "N/A") != "N/A" for a in hash_algorithms) and same_download(download_fields, existing_app_data):
+                    logging.info(f"No update for {app_name} (feed and download unchanged).")
+                    run_report.count(cache_hits=1)
+                    add_to_combined_xml(app_name, {**existing_app_data, **download_fields})
+                    new_feed_digests[app_name] = feed_digest
+                    return
+
+        with run_report.stage("extract"):
+            feed_type, app_data = parsed_feed or parse_feed(feed)
+
+            if feed_type == "json":
+                logging.info(f"JSON data: {app_data}")
+                extracted_data = process_json_data(app_data, config)
+            else:
+                extracted_data = process_xml_data(app_data, config)
 
         # Add manual entries
         extracted_data.update(config["manual_entries"])
 
+        # Add where the download link currently points; a new target means a new package.
+        # If the link cannot be resolved, the existing entry for the same link is kept.
+        existing_app_data = existing_data[app_name]["data"] if app_name in existing_data else {}
+        download_url = extracted_data.get("latest_download")
+        fallback = existing_app_data if existing_app_data.get("latest_download") == download_url else None
+        download_fields = url_resolver.download_fields(download_url, fallback=fallback)
+        extracted_data.update(download_fields)
+
         logging.info(f"Extracted data: {extracted_data}")
 
         # Special handling for OneDrive
@@ -461,30 +542,41 @@ def fetch_and_process(app_name, config):
 
             if not changes_detected and existing_app_data.get("sha1", "N/A") != "N/A" and existing_app_data.get("sha256", "N/A") != "N/A":
                 logging.info(f"No update for {app_name}.")
-                add_to_combined_xml(app_name, existing_app_data)
+                add_to_combined_xml(app_name, {**existing_app_data, **download_fields})
             else:
                 logging.info(f"Update detected for {app_name}.")
                 # Use existing SHA values if they are present and not "N/A"
-                if extracted_data.get("sha1", "N/A") == "N/A":
+                missing = [a for a in hash_algorithms if extracted_data.get(a, "N/A") == "N/A"]
+                if missing:
                     download_url = extracted_data.get("latest_download")
-                    logging.info(f"Download URL for SHA1: {download_url}")
-                    extracted_data["sha1"] = compute_sha1(download_url) if download_url else "N/A"
-                if extracted_data.get("sha256", "N/A") == "N/A":
-                    download_url = extracted_data.get("latest_download")
-                    logging.info(f"Download URL for SHA256: {download_url}")
-                    extracted_data["sha256"] = compute_sha256(download_url) if download_url else "N/A"
+                    logging.info(f"Download URL for hashing: {download_url}")
+                    extracted_data.update(hash_package(download_url, missing) if download_url else dict.fromkeys(missing, "N/A"))
+
+                # Hashing failed although the feed itself did not change: keep the existing hashes,
+                # and the download they belong to, so the next run retries instead of publishing N/A
+                feed_changed = any(
+                    extracted_data[key] != existing_app_data.get(key, "N/A")
+                    for key in extracted_data
+                    if key not in download_fields and key not in hash_algorithms
+                )
+                hashes_lost = any(extracted_data.get(a, "N/A") == "N/A" and existing_app_data.get(a, "N/A") != "N/A" for a in hash_algorithms)
+                if not feed_changed and hashes_lost:
+                    logging.warning(f"Could not hash the package for {app_name}; keeping the existing hashes until the next run.")
+                    for key in (*hash_algorithms, *download_fields):
+                        extracted_data[key] = existing_app_data.get(key, "N/A")
                 add_to_combined_xml(app_name, extracted_data)
         else:
             logging.info(f"New app {app_name} detected.")
             download_url = extracted_data.get("latest_download")
-            logging.info(f"Download URL for SHA1: {download_url}")
-            extracted_data["sha1"] = compute_sha1(download_url) if download_url else "N/A"
-            logging.info(f"Download URL for SHA256: {download_url}")
-            extracted_data["sha256"] = compute_sha256(download_url) if download_url else "N/A"
+            logging.info(f"Download URL for hashing: {download_url}")
+            extracted_data.update(hash_package(download_url) if download_url else dict.fromkeys(hash_algorithms, "N/A"))
             add_to_combined_xml(app_name, extracted_data)
+        new_feed_digests[app_name] = feed_digest
 
     except Exception as e:
         logging.error(f"Error processing {app_name}: {e}")
+        # Make sure the next run processes this feed in full instead of trusting a 304
+        http_cache.invalidate(config["url"])
         # Use existing data if processing fails
         if app_name in existing_data:
             logging.info(f"Reverting to existing data for {app_name}.")
@@ -493,9 +585,8 @@ def fetch_and_process(app_name, config):
 # Function to process XML data
 def process_xml_data(app_data, config):
     logging.info("Processing XML data...")
-    extracted_data = {}
-    for field, key in config["keys"].items():
-        extracted_data[field] = find_key_value(app_data, key)
+    values = extract_plist_values(app_data, config["keys"].values())
+    extracted_data = {field: values[key] for field, key in config["keys"].items()}
 
     last_updated = extracted_data.get("last_updated", "N/A")
     extracted_data["last_updated"] = convert_last_updated(last_updated)
@@ -506,28 +597,77 @@ def process_xml_data(app_data, config):
     logging.info("Successfully processed XML data.")
     return extracted_data
 
-# Helper function to find a key's value in the XML
-def find_key_value(element, key_name):
-    if element.tag == "dict":
-        found = False
-        for child in element:
-            if found:
-                logging.info(f"Found value for key {key_name}: {child.text}")
-                return child.text if child.text else "N/A"
-            if child.tag == "key" and child.text == key_name:
-                found = True
-    elif element.tag == "array":
-        for item in element:
-            value = find_key_value(item, key_name)
-            if value != "N/A":
-                return value
-    # Recursively search nested dicts and arrays
-    for child in element:
-        if child.tag in ["dict", "array"]:
-            value = find_key_value(child, key_name)
-            if value != "N/A":
-                return value
-    return "N/A"
+# The result of a plist <dict> or <array> for every key it has a value for. A dict's own
+# first <key> match decides the key for the whole dict (an empty value counts as no value);
+# otherwise the first nested container with a value wins.
+def _container_values(frame, key_names):
+    values = {}
+    for key_name in key_names:
+        value = frame["own"][key_name] if key_name in frame["own"] else frame["nested"].get(key_name)
+        if value and value != "N/A":
+            values[key_name] = value
+    return values
+
+# Function to find the values of several keys in a plist feed in one streaming pass
+def extract_plist_values(content, key_names):
+    """
+    Find the values of plist keys in the first <dict> of a feed with a single streaming pass.
+
+    A key's value is the element following the first <key> with that name in the dict.
+    Keys the dict does not have directly are looked up in its nested dicts and arrays, in
+    order. Parsing stops as soon as every key is found directly in the dict, or at its end.
+
+    Returns:
+        dict: The value of each key name, or "N/A" if it was not found.
+    """
+    key_names = set(key_names)
+    frames = []   # Open <dict>/<array> elements inside the searched dict, innermost last
+    values = None
+    depth = 0
+
+    for event, element in ET.iterparse(io.BytesIO(content), events=("start", "end")):
+        if event == "start":
+            depth += 1
+            # The searched dict is the first <dict> below the document element
+            if element.tag in ("dict", "array") and (frames or (element.tag == "dict" and depth > 1)):
+                frames.append({"tag": element.tag, "own": {}, "nested": {}, "pending": None})
+            continue
+
+        depth -= 1
+        if not frames:
+            continue
+
+        if element.tag in ("dict", "array"):
+            frame_values = _container_values(frames.pop(), key_names)
+            if not frames:
+                values = frame_values
+                break
+            for key_name, value in frame_values.items():
+                frames[-1]["nested"].setdefault(key_name, value)
+
+        parent = frames[-1]
+        if parent["tag"] == "dict":
+            # The element right after a matching <key> is its value
+            if parent["pending"] is not None:
+                parent["own"][parent["pending"]] = element.text
+                parent["pending"] = None
+            if element.tag == "key" and element.text in key_names and element.text not in parent["own"]:
+                parent["pending"] = element.text
+
+            # Every key found directly in the searched dict: nothing later can change the result
+            if len(frames) == 1 and len(parent["own"]) == len(key_names):
+                values = _container_values(parent, key_names)
+                break
+
+        # Drop the parsed element so the feed is never held as a full tree
+        element.clear()
+
+    if values is None:
+        raise ValueError("No <dict> found in the feed.")
+
+    for key_name, value in values.items():
+        logging.info(f"Found value for key {key_name}: {value}")
+    return {key_name: values.get(key_name, "N/A") for key_name in key_names}
 
 # Function to process JSON data
 def process_json_data(app_data, config):
@@ -543,66 +683,66 @@ def process_json_data(app_data, config):
 
     return extracted_data
 
-# Function to compute SHA1 hash
-def compute_sha1(url):
-    try:
-        logging.info(f"Computing SHA1 for {url}...")
-        # Use allow_redirects=True to follow redirects
-        response = requests.get(url, stream=True, allow_redirects=True)
-        response.raise_for_status()  # Raise exception for HTTP errors
-        hasher = sha1()
-        for chunk in response.iter_content(chunk_size=8192):
-            hasher.update(chunk)
-        sha1_hash = hasher.hexdigest()
-        logging.info(f"SHA1 for {url}: {sha1_hash}")
-        return sha1_hash
-    except Exception as e:
-        logging.error(f"Error computing SHA1 for {url}: {e}")
-        return "N/A"
+# Digests computed for every installer package, in output order
+hash_algorithms = ("sha1", "sha256")
 
-# Function to compute SHA256 hash
-def compute_sha256(url):
+# Function to compute all configured hashes from a single download of the package
+def compute_hashes(url, algorithms=hash_algorithms):
     try:
-        logging.info(f"Computing SHA256 for {url}...")
-        # Use allow_redirects=True to follow redirects
-        response = requests.get(url, stream=True, allow_redirects=True)
-        response.raise_for_status()  # Raise exception for HTTP errors
-        hasher = sha256()
-        for chunk in response.iter_content(chunk_size=8192):
-            hasher.update(chunk)
-        sha256_hash = hasher.hexdigest()
-        logging.info(f"SHA256 for {url}: {sha256_hash}")
-        return sha256_hash
+        logging.info(f"Computing {', '.join(a.upper() for a in algorithms)} for {url}...")
+        start_time = time.monotonic()
+        # Ranged, resumable download that hashes the package once for every algorithm
+        hashes, identity, total_bytes = range_download.download_hashes(url, algorithms)
+        elapsed = time.monotonic() - start_time
+        rate = total_bytes / elapsed if elapsed > 0 else 0
+        logging.info(f"Hashed {total_bytes} bytes from {url} in {elapsed:.2f}s ({rate:,.0f} bytes/sec)")
+        run_report.count(hashed_bytes=total_bytes, hash_seconds=elapsed)
+        for algorithm, value in hashes.items():
+            logging.info(f"{algorithm.upper()} for {url}: {value}")
+        # Remember the hashes against the exact bytes that were downloaded
+        hash_ledger.record(identity, hashes)
+        return hashes
     except Exception as e:
-        logging.error(f"Error computing SHA256 for {url}: {e}")
-        return "N/A"
+        logging.error(f"Error computing hashes for {url}: {e}")
+        return {algorithm: "N/A" for algorithm in algorithms}
+
+# Function to get a package's hashes, reusing the hash ledger when its bytes are provably unchanged
+def hash_package(url, algorithms=hash_algorithms):
+    with run_report.stage("hash_package"):
+        hashes = hash_ledger.lookup(hash_ledger.resolve(url), algorithms)
+        if hashes:
+            logging.info(f"Reusing hashes from the hash ledger for {url}")
+            run_report.count(cache_hits=1)
+            return hashes
+        return compute_hashes(url, algorithms)
+
+# Order of the fields in every package, shared by the XML, YAML and JSON outputs
+field_order = (
+    "name",
+    "application_id",
+    "application_name",
+    "CFBundleVersion",
+    "short_version",
+    "full_version",
+    "last_updated",
+    "min_os",
+    "update_download",
+    "latest_download",
+    "resolved_download",
+    "download_size",
+    "sha1",
+    "sha256",
+)
 
 def add_to_combined_xml(app_name, data):
     logging.info(f"Adding {app_name} to combined XML...")
-    package = ET.SubElement(root, "package")
-
-    # Add the elements in the specified order
-    order = [
-        "name",
-        "application_id",
-        "application_name",
-        "CFBundleVersion",
-        "short_version",
-        "full_version",
-        "last_updated",
-        "min_os",
-        "update_download",
-        "latest_download",
-        "sha1",
-        "sha256",
-    ]
-
-    for key in order:
-        if key == "name":  # Ensure the name element is added only once
-            name_element = ET.SubElement(package, key)
-            name_element.text = app_name
-        elif key in data:
-            ET.SubElement(package, key).text = data[key]
+
+    # Add the fields in the specified order; fields without data are left out of the XML
+    package = {"name": app_name}  # Ensure the name element is added only once
+    for key in field_order[1:]:
+        if key in data:
+            package[key] = data[key]
+    combined_feed.add_package(package)
 
     logging.info(f"Successfully added {app_name} to combined XML.")
 
@@ -618,94 +758,66 @@ def convert_last_updated(last_updated):
             pass
     return "N/A"
 
-# Process each app and populate combined XML
-for app_name, config in apps.items():
-    fetch_and_process(app_name, config)
-
-# Pretty print the XML
-def pretty_print_xml(element):
-    rough_string = ET.tostring(element, 'utf-8')
-    reparsed = minidom.parseString(rough_string)
-    return reparsed.toprettyxml(indent="    ")
-
-# Save the updated XML
-output_file = "latest_raw_files/macos_standalone_latest.xml"
-pretty_xml = pretty_print_xml(root)
-
-# Ensure the directory exists
-os.makedirs(os.path.dirname(output_file), exist_ok=True)
-
-with open(output_file, "w", encoding="utf-8") as f:
-    f.write(pretty_xml)
-
-logging.info("-" * 50)
-logging.info(f"XML output generated at: {output_file}")
-
-# Generate and save YAML output in the same order as XML
-yaml_data = {
-    "last_updated": last_update_date_time,
-    "packages": []
-}
-
-# Define the order of fields to match the XML
-field_order = [
-    "name",
-    "application_id",
-    "application_name",
-    "CFBundleVersion",
-    "short_version",
-    "full_version",
-    "last_updated",
-    "min_os",
-    "update_download",
-    "latest_download",
-    "sha1",
-    "sha256",
-]
-
-# Read the XML file
-xml_file = "latest_raw_files/macos_standalone_latest.xml"
-if os.path.exists(xml_file):
-    tree = ET.parse(xml_file)
-    xml_root = tree.getroot()
-
-    # Extract packages from XML
-    for package in xml_root.findall("package"):
-        package_data = {"name": package.find("name").text}
-        for field in field_order:
-            if field != "name":
-                element = package.find(field)
-                package_data[field] = element.text if element is not None else "N/A"
-        yaml_data["packages"].append(package_data)
-
-# Save the YAML file
-yaml_output_file = "latest_raw_files/macos_standalone_latest.yaml"
-
-# Ensure the directory exists
-os.makedirs(os.path.dirname(yaml_output_file), exist_ok=True)
-
-# Delete existing YAML file if it exists
-if os.path.exists(yaml_output_file):
-    os.remove(yaml_output_file)
-
-# Write the YAML data to the file
-with open(yaml_output_file, "w", encoding="utf-8") as yaml_file:
-    yaml.dump(yaml_data, yaml_file, default_flow_style=False, sort_keys=False)
-
-logging.info(f"YAML output generated at: {yaml_output_file}")
-
-# Generate and save JSON output in the same order as XML
-json_output_file = "latest_raw_files/macos_standalone_latest.json"
-
-# Ensure the directory exists
-os.makedirs(os.path.dirname(json_output_file), exist_ok=True)
-
-# Delete existing JSON file if it exists
-if os.path.exists(json_output_file):
-    os.remove(json_output_file)
-
-# Write the JSON data to the file
-with open(json_output_file, "w", encoding="utf-8") as json_file:
-    json.dump(yaml_data, json_file, indent=4)
+@run_report.run("macos_standalone_latest")
+def main():
+    """
+    Build the standalone package feed and write its XML, YAML and JSON outputs.
 
-logging.info(f"JSON output generated at: {json_output_file}")
+    Returns:
+        dict: The feed data that was written, as saved to the YAML and JSON files.
+    """
+    global last_update_date_time, combined_feed, existing_data, feed_digests, new_feed_digests
+
+    # Capture the current last update date and time
+    last_update_date_time = get_current_date_time()
+    logging.info(f"Current date and time: {last_update_date_time}")
+
+    # Initialize the combined feed with the last update date and time
+    combined_feed = feed_model.Feed(
+        root_tag="latest",
+        timestamp_key="last_updated",
+        timestamp=last_update_date_time,  # Value from get_current_date_time()
+        package_tag="package",
+        packages_key="packages",
+        fields=field_order,
+    )
+
+    # Read existing data from macos_standalone_latest.xml
+    existing_data = read_existing_xml("latest_raw_files/macos_standalone_latest.xml")
+    feed_digests = load_feed_digests() if precheck else {}
+    new_feed_digests = {}
+
+    # Fetch all feeds concurrently, then process each app in order to populate the combined feed
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        feed_cache = FeedCache(executor)
+        pending_feeds = {app_name: feed_cache.get(config["url"]) for app_name, config in apps.items()}
+        # Resolve every download link concurrently with the feed requests
+        url_resolver.prefetch({config["manual_entries"].get("latest_download") for config in apps.values()} - {None}, executor)
+        for app_name, config in apps.items():
+            with run_report.stage("process_app", app_name):
+                fetch_and_process(app_name, config, pending_feeds[app_name])
+
+    # Save the updated XML, YAML and JSON outputs
+    output_file = "latest_raw_files/macos_standalone_latest.xml"
+    yaml_output_file = "latest_raw_files/macos_standalone_latest.yaml"
+    json_output_file = "latest_raw_files/macos_standalone_latest.json"
+    binary_output_file = "latest_raw_files/macos_standalone_latest.cbor"
+
+    # Build the YAML and JSON data in the same order as XML directly from the feed
+    yaml_data = combined_feed.to_dict()
+
+    # Write all four files together as one snapshot (files where only the timestamp changed are skipped)
+    with run_report.stage("write_outputs"):
+        combined_feed.write_outputs(output_file, json_output_file, yaml_output_file, indent="    ", data=yaml_data, binary_path=binary_output_file)
+
+    # Entries that fell back to existing data keep the digest recorded for them
+    digests = {**feed_digests, **new_feed_digests}
+    save_feed_digests({app_name: digests[app_name] for app_name in apps if app_name in digests})
+
+    logging.info("-" * 50)
+    logging.info(f"Outputs generated at: {output_file}, {yaml_output_file}, {json_output_file}, {binary_output_file}")
+
+    return yaml_data
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,15 @@
+import os
+import json
+import hashlib
 import requests
-from bs4 import BeautifulSoup
-import xml.etree.ElementTree as ET
-from xml.dom import minidom
+import http_session
+import page_parser
 from datetime import datetime
 import pytz
 import logging
-import json
-import yaml
+import feed_model
+import output_stage
+import run_report
 
 # Configure logging with a cleaner and more human-readable format
 logging.basicConfig(
@@ -15,127 +18,221 @@ logging.basicConfig(
     datefmt='%B %d, %Y %I:%M %p'
 )
 
+# Set MOFA_FULL_HISTORY=1 to rebuild the whole history instead of merging new releases into it
+full_history = os.environ.get("MOFA_FULL_HISTORY", "0") == "1"
+
+xml_file = "latest_raw_files/macos_standalone_update_history.xml"
+json_file = "latest_raw_files/macos_standalone_update_history.json"
+yaml_file = "latest_raw_files/macos_standalone_update_history.yaml"
+binary_file = "latest_raw_files/macos_standalone_update_history.cbor"
+
+# Signature of the table rows below the newest release, recorded by the last run. Without
+# it (e.g. a fresh CI checkout without the .cache directory) the whole history is rebuilt
+state_file = os.environ.get("MOFA_UPDATE_HISTORY_STATE", ".cache/update_history_state.json")
+
+# Headers of the update history table
+table_headers = ["Release date", "Version", "Install package", "Update packages"]
+
+def load_existing_history(file_path):
+    """
+    Load the update history written by a previous run.
+
+    Returns:
+        dict: The saved history with its last_scan_date and releases, or None if there is no usable history.
+    """
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data.get("releases"), list):
+            return data
+    except (OSError, ValueError, AttributeError) as e:
+        logging.info(f"No existing update history loaded from {file_path}: {e}")
+    return None
+
+def load_state():
+    try:
+        with open(state_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_state(version, signature):
+    os.makedirs(os.path.dirname(state_file) or ".", exist_ok=True)
+    with open(state_file, "w", encoding="utf-8") as f:
+        json.dump({"version": version, "signature": signature}, f, indent=4)
+
+def rows_signature(rows):
+    """
+    Cheap signature of table rows: their count and a digest of their text and link targets,
+    so removing a download link from an older release (which archives it) changes it.
+
+    Returns:
+        str: The signature.
+    """
+    digest = hashlib.sha256()
+    for row in rows:
+        digest.update(row.get_text("|").encode("utf-8"))
+        for link in row.find_all('a'):
+            digest.update(link.get('href', '').encode("utf-8"))
+    return f"{len(rows)}:{digest.hexdigest()}"
+
+def parse_release_row(row):
+    """
+    Map one row of the update history table to a release entry.
+
+    Returns:
+        dict: The release with its date, version, download links and archive flag.
+    """
+    release = {}
+    has_links = False
+
+    for header, cell in zip(table_headers, row.find_all(['td', 'th'])):
+        links = cell.find_all('a')
+        if links:
+            values = [{"name": link.text.strip(), "url": link['href']} for link in links]
+        else:
+            values = [{"name": cell.text.strip(), "url": "NA"}]
+
+        # Map row data to specific XML elements
+        if header == "Release date":
+            release["date"] = values[0].get("name", "NA")
+        elif header == "Version":
+            release["version"] = values[0].get("name", "NA")
+        elif header == "Install package":
+            for value in values:
+                if "with teams" in value["name"].lower():
+                    release["businesspro_suite_download"] = value.get("url", "NA")
+                    has_links = True
+                elif "without teams" in value["name"].lower():
+                    release["suite_download"] = value.get("url", "NA")
+                    has_links = True
+        elif header == "Update packages":
+            for value in values:
+                if value.get("url", "NA") != "NA":
+                    tag_name = f"{value['name'].lower().replace(' ', '_')}_update"
+                    release[tag_name] = value.get("url", "NA")
+                    has_links = True
+
+    # Set archive to true if no links are present
+    release["archive"] = "false" if has_links else "true"
+    return release
+
+def find_history_table(soup):
+    # Identify the correct table by its headers
+    for table in soup.find_all('table'):
+        headers = [header.text.strip() for header in table.find_all('th')]
+        if headers == table_headers:
+            return table
+    return None
+
+def parse_releases(table, head_version=None):
+    """
+    Extract the releases from the update history table, newest first.
+
+    Rows are parsed up to and including the row of head_version, which is parsed again
+    so links added to the latest release after publication are picked up. Changes to the
+    older rows are caught by rows_signature() in scrape_office_mac_updates().
+
+    Returns:
+        list: The parsed release entries.
+    """
+    releases = []
+    for row in table.find_all('tr')[1:]:  # Skip the header row
+        release = parse_release_row(row)
+        releases.append(release)
+        if head_version is not None and release.get("version") == head_version:
+            logging.info(f"Reached the newest recorded release: {head_version}")
+            break
+    return releases
+
 def scrape_office_mac_updates(url):
     try:
         logging.info("Starting the scraping process.")
 
         # Send a GET request to the URL
-        response = requests.get(url)
-        response.raise_for_status()  # Raise an exception for HTTP errors
+        with run_report.stage("fetch_page"):
+            response = http_session.get(url)
+            response.raise_for_status()  # Raise an exception for HTTP errors
         logging.info("Successfully fetched the URL.")
 
-        # Parse the HTML content with BeautifulSoup
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # Identify the correct table by its headers
-        tables = soup.find_all('table')  # Get all tables
-        target_table = None
-
-        # Iterate through tables to find the one with desired headers
-        for table in tables:
-            headers = [header.text.strip() for header in table.find_all('th')]
-            if headers == ["Release date", "Version", "Install package", "Update packages"]:
-                target_table = table
-                break
+        # Parse only the tables of the page
+        with run_report.stage("parse_page"):
+            soup = page_parser.parse(response.text, only='table')
 
+        target_table = find_history_table(soup)
         if not target_table:
             logging.error("Target table not found on the page.")
             return
 
         logging.info("Target table found.")
 
-        # Extract rows from the target table
-        rows = []
-        for row in target_table.find_all('tr')[1:]:  # Skip the header row
-            cells = row.find_all(['td', 'th'])
-            row_data = {}
-            for i, cell in enumerate(cells):
-                links = cell.find_all('a')
-                if links:
-                    row_data[headers[i]] = [{"name": link.text.strip(), "url": link['href']} for link in links]
-                else:
-                    row_data[headers[i]] = [{"name": cell.text.strip(), "url": "NA"}]
-            rows.append(row_data)
+        # The newest release already in the history; rows are listed newest first
+        existing = None if full_history else load_existing_history(json_file)
+        head_version = existing["releases"][0].get("version") if existing and existing["releases"] else None
 
-        logging.info("Extracted rows from the target table.")
+        with run_report.stage("parse_page"):
+            rows = target_table.find_all('tr')[1:]  # Skip the header row
+            new_releases = parse_releases(target_table, head_version)
 
-        # Save the data to an XML file
-        root = ET.Element("Releases")
+            # Releases below the newest recorded one are copied from the existing history, which
+            # is only valid while their rows are unchanged (e.g. no links removed since the last
+            # run). Otherwise, or without a signature from the last run, rebuild the whole history.
+            merge_from = existing
+            older_signature = None
+            if head_version is not None and len(new_releases) < len(rows):
+                older_signature = rows_signature(rows[len(new_releases):])
+                state = load_state()
+                if state.get("version") != head_version or state.get("signature") != older_signature:
+                    logging.info("Older releases changed since the last run (or were never checked); rebuilding the whole history.")
+                    new_releases = parse_releases(target_table)
+                    merge_from = None
+        logging.info(f"Extracted {len(new_releases)} rows from the target table.")
 
+        # The signature the next run checks: the rows below the newest release
+        if len(new_releases) == 1 and older_signature is not None:
+            newest_signature = older_signature
+        else:
+            newest_signature = rows_signature(rows[1:])
+
+        # Build the release history in memory
         # Add last scan date in a human-readable format with time zone
         eastern = pytz.timezone('US/Eastern')
-        last_scan_date = ET.SubElement(root, "last_scan_date")
-        last_scan_date.text = datetime.now(eastern).strftime("%B %d, %Y %I:%M %p %Z")
-
-        for row in rows:
-            release = ET.SubElement(root, "release")
-            has_links = False
-
-            # Map row data to specific XML elements
-            for key, values in row.items():
-                if key == "Release date":
-                    ET.SubElement(release, "date").text = values[0].get("name", "NA")
-                elif key == "Version":
-                    version = values[0].get("name", "NA")
-                    ET.SubElement(release, "version").text = version
-                elif key == "Install package":
-                    for value in values:
-                        if "with teams" in value["name"].lower():
-                            ET.SubElement(release, "businesspro_suite_download").text = value.get("url", "NA")
-                            has_links = True
-                        elif "without teams" in value["name"].lower():
-                            ET.SubElement(release, "suite_download").text = value.get("url", "NA")
-                            has_links = True
-                elif key == "Update packages":
-                    for value in values:
-                        if value.get("url", "NA") != "NA":
-                            tag_name = f"{value['name'].lower().replace(' ', '_')}_update"
-                            app_update = ET.SubElement(release, tag_name)
-                            app_update.text = value.get("url", "NA")
-                            has_links = True
-
-            # Set archive to true if no links are present
-            ET.SubElement(release, "archive").text = "false" if has_links else "true"
-
-        logging.info("Mapped row data to XML elements.")
-
-        # Pretty-print the XML
-        xml_str = ET.tostring(root, encoding="utf-8")
-        pretty_xml = minidom.parseString(xml_str).toprettyxml(indent="    ")
-
-        # Write the pretty XML to a file
-        xml_file = "latest_raw_files/macos_standalone_update_history.xml"
-        with open(xml_file, "w", encoding="utf-8") as f:
-            f.write(pretty_xml)
-
-        logging.info(f"Data saved to {xml_file}")
-
-        # Convert XML data to JSON and YAML
-        tree = ET.ElementTree(ET.fromstring(xml_str))
-        root = tree.getroot()
-
-        data = {
-            "last_scan_date": root.find("last_scan_date").text,
-            "releases": []
-        }
-
-        for release in root.findall("release"):
-            release_data = {}
-            for child in release:
-                release_data[child.tag] = child.text
-            data["releases"].append(release_data)
-
-        # Write the JSON data to a file
-        json_file = "latest_raw_files/macos_standalone_update_history.json"
-        with open(json_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4)
-        logging.info(f"Data saved to {json_file}")
-
-        # Write the YAML data to a file
-        yaml_file = "latest_raw_files/macos_standalone_update_history.yaml"
-        with open(yaml_file, "w", encoding="utf-8") as f:
-            yaml.dump(data, f, default_flow_style=False, sort_keys=False)
-        logging.info(f"Data saved to {yaml_file}")
+        feed = feed_model.Feed(
+            root_tag="Releases",
+            timestamp_key="last_scan_date",
+            timestamp=datetime.now(eastern).strftime("%B %d, %Y %I:%M %p %Z"),
+            package_tag="release",
+            packages_key="releases",
+        )
+
+        # Merge the parsed rows in front of the recorded releases they do not replace
+        new_versions = {release.get("version") for release in new_releases}
+        for release in new_releases:
+            feed.add_package(release)
+        if merge_from:
+            for release in merge_from["releases"]:
+                if release.get("version") not in new_versions:
+                    feed.add_package(release)
+
+        logging.info("Mapped row data to release entries.")
+
+        # Build the JSON and YAML data directly from the in-memory history
+        data = feed.to_dict()
+
+        if existing and data["releases"] == existing["releases"] and os.path.exists(binary_file):
+            logging.info("No new or changed releases; keeping the existing update history files.")
+            output_stage.ensure_variants((xml_file, json_file, yaml_file, binary_file))
+            if new_releases:
+                save_state(new_releases[0].get("version"), newest_signature)
+            return existing
+
+        # Write the XML, JSON, YAML and binary files together as one snapshot
+        with run_report.stage("write_outputs"):
+            feed.write_outputs(xml_file, json_file, yaml_file, indent="    ", data=data, binary_path=binary_file)
+        if new_releases:
+            save_state(new_releases[0].get("version"), newest_signature)
+
+        return data
 
     except requests.exceptions.RequestException as e:
         logging.error(f"Error fetching the URL: {e}")
@@ -145,5 +242,16 @@ def scrape_office_mac_updates(url):
 # URL of the webpage to scrape
 url = "https://learn.microsoft.com/en-us/officeupdates/update-history-office-for-mac"
 
-# Call the scraping function
-scrape_office_mac_updates(url)
+@run_report.run("macos_standalone_update_history")
+def main():
+    """
+    Scrape the Office for Mac update history and write it as XML, JSON and YAML.
+
+    Returns:
+        dict: The update history that was written, or None if scraping failed.
+    """
+    return scrape_office_mac_updates(url)
+
+if __name__ == "__main__":
+    main()
+
@@ -0,0 +1,91 @@
+import os
+import json
+import logging
+import threading
+from datetime import datetime, timezone
+import url_resolver
+
+# Durable record of installer hashes, keyed by the identity of the bytes that were hashed
+ledger_file = os.environ.get("MOFA_HASH_LEDGER", ".cache/hash_ledger.json")
+
+_lock = threading.Lock()
+_entries = None
+
+
+def package_identity(response):
+    """
+    Build the ledger key for a package from a HEAD or GET response.
+
+    The key combines the final URL after redirects with Content-Length and Last-Modified.
+    The ETag is only used when there is no Last-Modified, because CDN edge servers send
+    different ETags for the same file. Responses without either cannot prove that the
+    bytes are unchanged, so they get no identity and are always re-hashed.
+
+    Returns:
+        str: The ledger key, or None if the response carries no validators.
+    """
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if not etag and not last_modified:
+        return None
+    content_length = response.headers.get("Content-Length", "")
+    return "|".join([response.url, content_length, last_modified or etag])
+
+
+def resolve(url):
+    """
+    Resolve a download URL with a (per-run cached) HEAD request and return its package identity.
+
+    Returns:
+        str: The ledger key, or None if it could not be determined.
+    """
+    try:
+        return package_identity(url_resolver.resolve(url))
+    except Exception as e:
+        logging.warning(f"Could not resolve {url} for the hash ledger: {e}")
+        return None
+
+
+def _load():
+    global _entries
+    if _entries is None:
+        try:
+            with open(ledger_file, "r", encoding="utf-8") as f:
+                _entries = json.load(f)
+        except (OSError, ValueError):
+            _entries = {}
+    return _entries
+
+
+def _save():
+    os.makedirs(os.path.dirname(ledger_file) or ".", exist_ok=True)
+    temp_file = f"{ledger_file}.tmp"
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(_entries, f, indent=4, sort_keys=True)
+    os.replace(temp_file, ledger_file)
+
+
+def lookup(identity, algorithms):
+    """
+    Find previously computed hashes for a package identity.
+
+    Returns:
+        dict: The hashes for every requested algorithm, or None if any is missing.
+    """
+    if identity is None:
+        return None
+    with _lock:
+        entry = _load().get(identity)
+    if not entry or any(entry.get(a, "N/A") == "N/A" for a in algorithms):
+        return None
+    return {a: entry[a] for a in algorithms}
+
+
+def record(identity, hashes):
+    if identity is None or any(value == "N/A" for value in hashes.values()):
+        return
+    with _lock:
+        entry = _load().setdefault(identity, {})
+        entry.update(hashes)
+        entry["recorded"] = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        _save()
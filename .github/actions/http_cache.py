@@ -0,0 +1,117 @@
+import os
+import json
+import logging
+import hashlib
+import http_session
+import run_report
+
+# Directory holding cached feed bodies and their validators between runs
+cache_dir = os.environ.get("MOFA_CACHE_DIR", ".cache/http")
+
+
+class CachedResponse:
+    """
+    The body of a feed, either freshly downloaded or served from the on-disk cache.
+
+    Attributes:
+        url (str): The requested URL.
+        status_code (int): The HTTP status of the revalidation request (200 or 304).
+        content_type (str): The Content-Type the body was served with.
+        content (bytes): The feed body.
+        not_modified (bool): True when the server answered 304 and the body came from disk.
+    """
+
+    def __init__(self, url, status_code, content_type, content, not_modified):
+        self.url = url
+        self.status_code = status_code
+        self.content_type = content_type
+        self.content = content
+        self.not_modified = not_modified
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def _cache_paths(url):
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, f"{key}.json"), os.path.join(cache_dir, f"{key}.body")
+
+
+def _write_file(path, data):
+    # Write to a temporary file first so a crash never leaves a truncated cache entry
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def read_entry(url):
+    """
+    Read the cached validators and body for a URL.
+
+    Returns:
+        tuple: (metadata dict, body bytes), or (None, None) if nothing usable is cached.
+    """
+    meta_path, body_path = _cache_paths(url)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        with open(body_path, "rb") as f:
+            body = f.read()
+        return metadata, body
+    except (OSError, ValueError):
+        return None, None
+
+
+def store_entry(url, response):
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if not etag and not last_modified:
+        return
+
+    metadata = {
+        "url": url,
+        "etag": etag,
+        "last_modified": last_modified,
+        "content_type": response.headers.get("Content-Type", ""),
+    }
+    meta_path, body_path = _cache_paths(url)
+    os.makedirs(cache_dir, exist_ok=True)
+    _write_file(body_path, response.content)
+    _write_file(meta_path, json.dumps(metadata, indent=4).encode("utf-8"))
+
+
+def invalidate(url):
+    """
+    Drop the cached entry for a URL so the next run downloads and processes it in full.
+    """
+    for path in _cache_paths(url):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def fetch(url, **kwargs):
+    """
+    GET a URL, revalidating any cached copy with If-None-Match / If-Modified-Since.
+
+    Returns:
+        CachedResponse: The response, with not_modified set when the cached body was reused.
+    """
+    metadata, body = read_entry(url)
+    headers = dict(kwargs.pop("headers", {}))
+    if metadata:
+        if metadata.get("etag"):
+            headers["If-None-Match"] = metadata["etag"]
+        if metadata.get("last_modified"):
+            headers["If-Modified-Since"] = metadata["last_modified"]
+
+    response = http_session.get(url, headers=headers, **kwargs)
+
+    if response.status_code == 304 and metadata:
+        logging.info(f"Not modified since last run: {url}")
+        run_report.count(cache_hits=1)
+        return CachedResponse(url, 304, metadata.get("content_type", ""), body, True)
+
+    response.raise_for_status()
+    store_entry(url, response)
+    return CachedResponse(url, response.status_code, response.headers.get("Content-Type", ""), response.content, False)
@@ -0,0 +1,204 @@
+import io
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPResponse
+from urllib3._collections import HTTPHeaderDict
+
+# live: talk to the real servers; record: talk to them and save every response; replay: serve saved responses only
+mode = os.environ.get("MOFA_HTTP_MODE", "live")
+
+# Fixture store: index.json maps "METHOD URL" to the recorded status and headers, bodies/ holds the bodies by SHA256
+fixtures_dir = os.environ.get("MOFA_FIXTURES_DIR", ".cache/fixtures")
+
+# Delay added to every replayed response, to model network round trips
+replay_latency = float(os.environ.get("MOFA_REPLAY_LATENCY_MS", "0")) / 1000
+
+# Request headers that select part of a response; recording always captures the full response
+partial_headers = ("If-None-Match", "If-Modified-Since", "Range", "If-Range")
+
+# Headers that describe the wire framing of the recorded response rather than its content
+framing_headers = ("Transfer-Encoding", "Connection", "Keep-Alive")
+
+_lock = threading.Lock()
+_index = None
+_record_locks = {}
+
+
+def _index_path():
+    return os.path.join(fixtures_dir, "index.json")
+
+
+def _body_path(digest):
+    return os.path.join(fixtures_dir, "bodies", digest)
+
+
+def _load_index():
+    global _index
+    if _index is None:
+        try:
+            with open(_index_path(), "r", encoding="utf-8") as f:
+                _index = json.load(f)
+        except (OSError, ValueError):
+            _index = {}
+    return _index
+
+
+def _save_index():
+    os.makedirs(fixtures_dir, exist_ok=True)
+    temp_path = f"{_index_path()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(_index, f, indent=4, sort_keys=True)
+    os.replace(temp_path, _index_path())
+
+
+class _FileSlice(io.RawIOBase):
+    """
+    Read-only view of length bytes of a file starting at offset, so large ranges are
+    served without loading them into memory.
+    """
+
+    def __init__(self, path, offset, length):
+        self._file = open(path, "rb")
+        self._file.seek(offset)
+        self._remaining = length
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._remaining <= 0:
+            return 0
+        data = self._file.read(min(len(buffer), self._remaining))
+        buffer[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def _not_modified(request, headers):
+    etag = headers.get("ETag")
+    last_modified = headers.get("Last-Modified")
+    if etag and request.headers.get("If-None-Match") == etag:
+        return True
+    return bool(last_modified and request.headers.get("If-Modified-Since") == last_modified)
+
+
+def _byte_range(request, headers, size):
+    # The (start, end) of a satisfiable single "bytes=start-end" range, or None to send the whole body
+    value = request.headers.get("Range", "")
+    if not value.startswith("bytes=") or "," in value:
+        return None
+    if_range = request.headers.get("If-Range")
+    if if_range and if_range not in (headers.get("ETag"), headers.get("Last-Modified")):
+        return None
+    start, _, end = value[len("bytes="):].partition("-")
+    if not start.isdigit() or int(start) >= size:
+        return None
+    end = int(end) if end.isdigit() else size - 1
+    return int(start), min(end, size - 1)
+
+
+class FixtureAdapter(HTTPAdapter):
+    """
+    Transport adapter that records responses into the fixture store, or replays them
+    from it without touching the network.
+
+    Each "METHOD URL" is recorded once, in full, including redirect responses (the session
+    follows them hop by hop). Replay then answers conditional and range requests from the
+    full recording the way the server would: 304 when the validators match, 206 for a
+    byte range.
+    """
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        key = f"{request.method} {request.url}"
+        with _lock:
+            entry = _load_index().get(key)
+
+        if entry is None:
+            if mode != "record":
+                raise requests.exceptions.ConnectionError(f"No recorded fixture for {key}", request=request)
+            # Record each response once, even when parallel range requests ask for it together
+            with _lock:
+                record_lock = _record_locks.setdefault(key, threading.Lock())
+            with record_lock:
+                with _lock:
+                    entry = _load_index().get(key)
+                if entry is None:
+                    entry = self._record(request, key, timeout, verify, cert, proxies)
+
+        if replay_latency:
+            time.sleep(replay_latency)
+        return self._replay(request, entry)
+
+    def _record(self, request, key, timeout, verify, cert, proxies):
+        live_request = request.copy()
+        for header in partial_headers:
+            live_request.headers.pop(header, None)
+        response = super().send(live_request, stream=True, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+
+        headers = [(name, value) for name, value in response.raw.headers.items() if name.title() not in framing_headers]
+        digest = None
+        if request.method != "HEAD":
+            # Store the body exactly as sent (still content-encoded), named by its digest
+            os.makedirs(os.path.join(fixtures_dir, "bodies"), exist_ok=True)
+            temp_path = _body_path(f"{threading.get_ident()}.tmp")
+            hasher = hashlib.sha256()
+            size = 0
+            with open(temp_path, "wb") as f:
+                for chunk in response.raw.stream(1024 * 1024, decode_content=False):
+                    hasher.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            digest = hasher.hexdigest()
+            os.replace(temp_path, _body_path(digest))
+            headers = [(name, value) for name, value in headers if name.lower() != "content-length"]
+            headers.append(("Content-Length", str(size)))
+        response.close()
+
+        entry = {"status": response.status_code, "reason": response.reason, "headers": headers, "body": digest}
+        with _lock:
+            _load_index()[key] = entry
+            _save_index()
+        logging.info(f"Recorded fixture for {key}")
+        return entry
+
+    def _replay(self, request, entry):
+        headers = HTTPHeaderDict(entry["headers"])
+        status = entry["status"]
+        body = io.BytesIO(b"")
+
+        if entry["body"] and request.method != "HEAD":
+            path = _body_path(entry["body"])
+            size = os.path.getsize(path)
+            byte_range = _byte_range(request, headers, size) if status == 200 else None
+            if status == 200 and _not_modified(request, headers):
+                status = 304
+            elif byte_range:
+                start, end = byte_range
+                status = 206
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+                headers["Content-Length"] = str(end - start + 1)
+                body = _FileSlice(path, start, end - start + 1)
+            else:
+                body = _FileSlice(path, 0, size)
+
+        raw = HTTPResponse(
+            body=body,
+            headers=headers,
+            status=status,
+            reason=entry["reason"] if status == entry["status"] else None,
+            preload_content=False,
+            decode_content=False,
+            request_method=request.method,
+            request_url=request.url,
+        )
+        return self.build_response(request, raw)
@@ -0,0 +1,84 @@
+import os
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import http_fixtures
+import run_report
+
+# Transport settings shared by every generator, overridable from the environment
+connect_timeout = float(os.environ.get("MOFA_HTTP_CONNECT_TIMEOUT", "10"))
+read_timeout = float(os.environ.get("MOFA_HTTP_READ_TIMEOUT", "60"))
+max_retries = int(os.environ.get("MOFA_HTTP_RETRIES", "3"))
+backoff_factor = float(os.environ.get("MOFA_HTTP_BACKOFF", "1.0"))
+backoff_jitter = float(os.environ.get("MOFA_HTTP_BACKOFF_JITTER", "1.0"))
+pool_maxsize = int(os.environ.get("MOFA_HTTP_POOL_MAXSIZE", "16"))
+
+_lock = threading.Lock()
+_session = None
+
+
+class JitterRetry(Retry):
+    """
+    Retry policy that adds random jitter on top of urllib3's exponential backoff,
+    so concurrent requests to the same host do not retry in lockstep.
+    """
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return backoff + random.uniform(0, backoff_jitter) if backoff else backoff
+
+
+def create_session():
+    retry = JitterRetry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    # One keep-alive connection pool per host, so repeated requests to the same
+    # CDN reuse their TCP/TLS connections instead of handshaking every time.
+    # In record/replay mode (MOFA_HTTP_MODE) responses go through the fixture store.
+    adapter_class = HTTPAdapter if http_fixtures.mode == "live" else http_fixtures.FixtureAdapter
+    adapter = adapter_class(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session():
+    """
+    Get the process-wide pooled session, creating it on first use.
+
+    Returns:
+        requests.Session: The shared session.
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+
+def request(method, url, **kwargs):
+    kwargs.setdefault("timeout", (connect_timeout, read_timeout))
+    response = get_session().request(method, url, **kwargs)
+    # Streamed bodies are counted by whoever reads them
+    body_bytes = 0 if kwargs.get("stream") else len(response.content)
+    run_report.count(requests=1 + len(response.history), bytes=body_bytes)
+    return response
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def head(url, **kwargs):
+    return request("HEAD", url, **kwargs)
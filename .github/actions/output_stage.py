@@ -0,0 +1,229 @@
+import os
+import re
+import gzip
+import json
+import logging
+import threading
+import binary_feed
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Top-level run timestamps that change on every run without the feed content changing
+volatile_keys = ("last_updated", "last_scan_date")
+
+_keys = "|".join(volatile_keys)
+
+# The run timestamp in each output format. It is always the first of these in a file,
+# ahead of any per-package field with the same name.
+_timestamp_patterns = {
+    ".xml": re.compile(rf"<({_keys})>[^<]*</\1>|<({_keys})/>"),
+    ".json": re.compile(rf'"({_keys})": (?:"(?:[^"\\]|\\.)*"|null)'),
+    ".yaml": re.compile(rf"^({_keys}):.*$", re.MULTILINE),
+}
+
+# Set MOFA_PRECOMPRESS=0 to publish only the plain files, without .gz/.br siblings and minified JSON
+precompress = os.environ.get("MOFA_PRECOMPRESS", "1") == "1"
+
+# Whether each file written during this run changed, by path
+_lock = threading.Lock()
+report = {}
+
+
+def _without_timestamp(path, content):
+    pattern = _timestamp_patterns.get(os.path.splitext(path)[1])
+    return pattern.sub("", content, count=1) if pattern else content
+
+
+def _binary_without_timestamp(content):
+    feed = binary_feed.decode(content)
+    return {key: value for key, value in feed.items() if key not in volatile_keys} if isinstance(feed, dict) else feed
+
+
+def content_changed(path, content):
+    """
+    Compare new output with the file on disk, ignoring the run timestamp. Binary (.cbor)
+    feeds are compared by their decoded data.
+
+    Returns:
+        bool: True if the file is missing or differs in anything but its timestamp.
+    """
+    try:
+        with open(path, "rb") as f:
+            existing = f.read()
+        if isinstance(content, bytes):
+            return _binary_without_timestamp(existing) != _binary_without_timestamp(content)
+        existing = existing.decode("utf-8")
+    except (OSError, UnicodeDecodeError, ValueError, IndexError):
+        return True
+    return _without_timestamp(path, existing) != _without_timestamp(path, content)
+
+
+def _fsync_directory(directory):
+    # Make the renames themselves durable; not every platform can open a directory
+    try:
+        fd = os.open(directory or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _minified_path(path):
+    return f"{os.path.splitext(path)[0]}.min.json"
+
+
+def variant_paths(path, enabled_only=True):
+    """
+    The precompressed and minified files published next to an output file.
+
+    Returns:
+        list: The sibling paths; with enabled_only, empty when precompression is off and
+        without .br files when brotli is not installed.
+    """
+    if enabled_only and not precompress:
+        return []
+    sources = [path, _minified_path(path)] if path.endswith(".json") else [path]
+    suffixes = (".gz", ".br") if brotli or not enabled_only else (".gz",)
+    variants = [f"{source}{suffix}" for source in sources for suffix in suffixes]
+    return variants + sources[1:]
+
+
+def render_variants(path, content):
+    """
+    Build the siblings of an output file: gzip and brotli copies, plus a minified copy
+    (itself compressed too) for JSON. The encodings are deterministic: the gzip header
+    carries no timestamp or file name, so unchanged content always gives identical bytes.
+
+    Returns:
+        dict: Sibling path -> bytes.
+    """
+    sources = {path: content}
+    if path.endswith(".json"):
+        minified = json.dumps(json.loads(content), separators=(",", ":"))
+        sources[_minified_path(path)] = minified.encode("utf-8")
+
+    variants = {}
+    for source_path, data in sources.items():
+        if source_path != path:
+            variants[source_path] = data
+        variants[f"{source_path}.gz"] = gzip.compress(data, compresslevel=9, mtime=0)
+        if brotli:
+            variants[f"{source_path}.br"] = brotli.compress(data, mode=brotli.MODE_TEXT, quality=11)
+    return variants
+
+
+def _stage(path, content):
+    # Write the new content next to the target so the rename stays on the same file system
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    return temp_path
+
+
+def _publish(files):
+    """
+    Write path -> bytes as one snapshot: stage and fsync every file, then rename them all.
+    """
+    staged = {}
+    try:
+        for path, content in files.items():
+            staged[path] = _stage(path, content)
+    except BaseException:
+        # Nothing has been renamed yet: drop the staged files and keep the old snapshot
+        for path in files:
+            if os.path.exists(f"{path}.tmp"):
+                os.remove(f"{path}.tmp")
+        raise
+
+    for path, temp_path in staged.items():
+        os.replace(temp_path, path)
+    for directory in {os.path.dirname(path) for path in staged}:
+        _fsync_directory(directory)
+
+
+def _missing_variants(paths):
+    # Siblings of unchanged files that are not on disk yet (e.g. the first run with precompression)
+    files = {}
+    for path in paths:
+        if os.path.exists(path) and not all(os.path.exists(variant) for variant in variant_paths(path)):
+            with open(path, "rb") as f:
+                files.update(render_variants(path, f.read()))
+            logging.info(f"Compressed and minified copies added for: {path}")
+    return files
+
+
+def ensure_variants(paths):
+    """
+    Publish the missing siblings of output files that were not rewritten this run.
+    """
+    files = _missing_variants(paths)
+    if files:
+        _publish(files)
+
+
+def write_outputs(outputs):
+    """
+    Write a set of output files (e.g. the XML, JSON and YAML of one feed) as one snapshot.
+
+    Files whose content only differs in the run timestamp are left untouched. Every
+    changed file is first written and fsynced to a temporary file in its own directory;
+    only when all of them are on disk are they renamed into place, one right after the
+    other. A reader therefore never sees a missing or half-written file, and never sees
+    one format of a feed from a different run than the others for longer than the renames take.
+
+    Every output also gets .gz and .br siblings, and JSON a minified .min.json copy (see
+    render_variants()). They are rebuilt together with the file they were made from, so
+    they are only recompressed when its content changes.
+
+    Args:
+        outputs (dict): Path -> new file content: text, or bytes for a binary (.cbor) feed.
+
+    Returns:
+        dict: Path -> True if the file was written.
+    """
+    changed = {path: content_changed(path, content) for path, content in outputs.items()}
+    # A file published for the first time (e.g. a new format) carries this run's timestamp:
+    # rewrite the rest of the snapshot with it too, so all formats agree
+    if any(not os.path.exists(path) for path in outputs):
+        changed = dict.fromkeys(outputs, True)
+    with _lock:
+        report.update(changed)
+
+    files = _missing_variants(path for path in outputs if not changed[path])
+    for path, content in outputs.items():
+        if changed[path]:
+            data = content.encode("utf-8") if isinstance(content, str) else content
+            if precompress:
+                files.update(render_variants(path, data))
+            files[path] = data
+    _publish(files)
+
+    # Siblings that were not rebuilt with their changed file (precompression turned off,
+    # brotli no longer installed) would be stale: remove them
+    for path in outputs:
+        if changed[path]:
+            for variant in variant_paths(path, enabled_only=False):
+                if variant not in files and os.path.exists(variant):
+                    os.remove(variant)
+
+    for path, was_changed in changed.items():
+        if was_changed:
+            logging.info(f"Content changed, written: {path}")
+        else:
+            logging.info(f"Unchanged apart from the timestamp, not rewritten: {path}")
+    return changed
+
+
+def log_report():
+    for path, changed in sorted(report.items()):
+        logging.info(f"{path}: {'changed' if changed else 'unchanged'}")
@@ -0,0 +1,90 @@
+import os
+import logging
+from bs4 import BeautifulSoup, SoupStrainer
+
+# HTML parser backend for the learn.microsoft.com scrapers: auto, lxml, selectolax or html.parser
+parser_backend = os.environ.get("MOFA_HTML_PARSER", "auto")
+
+# Backends in order of preference for "auto". selectolax only locates the subtree, which is
+# then parsed with html.parser, so it only pays off when the subtree is a small part of the page.
+backends = ("lxml", "selectolax", "html.parser")
+
+
+def is_available(backend):
+    """
+    Check whether the optional package behind a backend is installed.
+
+    Returns:
+        bool: True if the backend can be used.
+    """
+    try:
+        if backend == "selectolax":
+            import selectolax.lexbor  # noqa: F401
+        elif backend == "lxml":
+            import lxml  # noqa: F401
+        elif backend != "html.parser":
+            return False
+    except ImportError:
+        return False
+    return True
+
+
+def available_backends():
+    return [backend for backend in backends if is_available(backend)]
+
+
+def resolve_backend(backend=None):
+    """
+    Pick the backend to use: the requested one if it is installed, otherwise the fastest installed one.
+
+    Returns:
+        str: The backend name.
+    """
+    backend = backend or parser_backend
+    if backend != "auto":
+        if is_available(backend):
+            return backend
+        logging.warning(f"HTML parser backend {backend} is not available; choosing one automatically.")
+    return available_backends()[0]
+
+
+def _parse_selectolax(html, only):
+    # selectolax finds the subtree with its C parser; BeautifulSoup then only builds that fragment
+    from selectolax.lexbor import LexborHTMLParser
+
+    nodes = LexborHTMLParser(html).css(only)
+    if not nodes:
+        return None
+    return BeautifulSoup("".join(node.html for node in nodes), "html.parser")
+
+
+def parse(html, only="main", backend=None):
+    """
+    Parse the relevant part of a documentation page into a BeautifulSoup tree.
+
+    Only the elements matching the tag name in only (and everything inside them) are
+    kept, so the navigation and footer of the page are never built into the tree. Pages
+    without such an element are parsed in full.
+
+    Args:
+        html (str): The page source.
+        only (str): Tag name of the subtree to keep, e.g. "main" or "table".
+        backend (str): Backend to use instead of MOFA_HTML_PARSER.
+
+    Returns:
+        BeautifulSoup: The parsed subtree.
+    """
+    backend = resolve_backend(backend)
+
+    if backend == "selectolax":
+        soup = _parse_selectolax(html, only)
+    else:
+        soup = BeautifulSoup(html, backend, parse_only=SoupStrainer(only))
+        if soup.find(only) is None:
+            soup = None
+
+    if soup is None:
+        fallback = "html.parser" if backend == "selectolax" else backend
+        logging.warning(f"No <{only}> element found; parsing the whole page with {fallback}.")
+        soup = BeautifulSoup(html, fallback)
+    return soup
@@ -0,0 +1,213 @@
+import os
+import re
+import sys
+import json
+import time
+import runpy
+import logging
+import argparse
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+# Set MOFA_PROFILE=1 (or run a script through this module) to profile every generator run
+enabled = os.environ.get("MOFA_PROFILE", "0") == "1"
+
+# Where the collapsed stacks, Chrome trace and memory report of each run are written
+profile_dir = os.environ.get("MOFA_PROFILE_DIR", ".cache/profiles")
+
+# Time between two stack samples of every thread
+sample_interval = float(os.environ.get("MOFA_PROFILE_INTERVAL_MS", "5")) / 1000
+
+# Allocation sites listed in the memory report
+top_allocations = 25
+
+_lock = threading.Lock()
+_active = False
+
+
+class Sampler(threading.Thread):
+    """
+    Background thread that records the Python stack of every other thread at a fixed
+    interval. Sampling measures wall time, so threads waiting on the network show up
+    as well, and the overhead does not depend on how many functions are called.
+    """
+
+    def __init__(self, interval):
+        super().__init__(name="profiler-sampler", daemon=True)
+        self.interval = interval
+        self.ticks = []   # (seconds since start, {thread id: (thread name, stack root first)})
+        self.stopped = threading.Event()
+        self.start_time = time.perf_counter()
+        self._labels = {}
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            name = getattr(code, "co_qualname", code.co_name)
+            label = self._labels[code] = f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            now = time.perf_counter() - self.start_time
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = {}
+            for ident, frame in sys._current_frames().items():
+                if ident == self.ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack.reverse()
+                stacks[ident] = (names.get(ident, str(ident)), tuple(stack))
+            self.ticks.append((now, stacks))
+
+
+def collapsed_stacks(ticks):
+    """
+    Count identical stacks in the collapsed format read by flamegraph.pl and speedscope:
+    one "thread;outermost;...;innermost count" line per stack.
+
+    Returns:
+        list: The lines, sorted.
+    """
+    counts = {}
+    for _, stacks in ticks:
+        for name, stack in stacks.values():
+            # Workers of one pool share a flame instead of one each
+            key = ";".join((re.sub(r"_\d+$", "", name),) + stack)
+            counts[key] = counts.get(key, 0) + 1
+    return sorted(f"{key} {count}" for key, count in counts.items())
+
+
+def trace_events(ticks, interval):
+    """
+    Turn the samples into Chrome trace events (chrome://tracing, Perfetto): a function
+    is shown as running from the first sample its frame appears in until the first
+    sample it is gone from.
+
+    Returns:
+        list: The begin, end and thread name events.
+    """
+    pid = os.getpid()
+    events = []
+    open_stacks = {}
+    thread_names = {}
+
+    def close(ident, stack, ts):
+        for label in reversed(stack):
+            events.append({"name": label, "ph": "E", "ts": ts, "pid": pid, "tid": ident})
+
+    for now, stacks in ticks:
+        ts = round(now * 1e6)
+        for ident in list(open_stacks):
+            if ident not in stacks:
+                close(ident, open_stacks.pop(ident), ts)
+        for ident, (name, stack) in stacks.items():
+            thread_names[ident] = name
+            previous = open_stacks.get(ident, ())
+            common = 0
+            while common < min(len(previous), len(stack)) and previous[common] == stack[common]:
+                common += 1
+            close(ident, previous[common:], ts)
+            for label in stack[common:]:
+                events.append({"name": label, "ph": "B", "ts": ts, "pid": pid, "tid": ident})
+            open_stacks[ident] = stack
+
+    end = round((ticks[-1][0] + interval) * 1e6) if ticks else 0
+    for ident, stack in open_stacks.items():
+        close(ident, stack, end)
+    for ident, name in thread_names.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": ident, "args": {"name": name}})
+    return events
+
+
+def _write_profile(name, sampler, snapshot, peak):
+    os.makedirs(profile_dir, exist_ok=True)
+    base = os.path.join(profile_dir, name)
+
+    with open(f"{base}.collapsed.txt", "w", encoding="utf-8") as f:
+        f.writelines(f"{line}\n" for line in collapsed_stacks(sampler.ticks))
+
+    with open(f"{base}.trace.json", "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": trace_events(sampler.ticks, sampler.interval), "displayTimeUnit": "ms"}, f)
+
+    with open(f"{base}.memory.txt", "w", encoding="utf-8") as f:
+        f.write(f"Peak traced memory: {peak} bytes\n\n")
+        f.write(f"Top {top_allocations} allocation sites still held at the end of the run:\n")
+        f.writelines(f"{stat}\n" for stat in snapshot.statistics("lineno")[:top_allocations])
+
+    logging.info(f"Profile of {name} written to {base}.collapsed.txt, {base}.trace.json and {base}.memory.txt (peak memory {peak} bytes)")
+
+
+@contextmanager
+def profile(name):
+    """
+    Profile the enclosed block when profiling is enabled: stack samples of every thread
+    and the tracemalloc peak, written to profile_dir as {name}.collapsed.txt,
+    {name}.trace.json and {name}.memory.txt. Only the outermost profiled block of a
+    process is profiled, so run_pipeline.py produces one profile covering every stage.
+
+    tracemalloc slows allocation-heavy code down noticeably; compare timings from the
+    run report of unprofiled runs only.
+
+    Yields:
+        dict: Filled with peak_memory_bytes when the block ends, or None when not profiling.
+    """
+    global _active
+    with _lock:
+        start = enabled and not _active
+        if start:
+            _active = True
+    if not start:
+        yield None
+        return
+
+    was_tracing = tracemalloc.is_tracing()
+    if was_tracing:
+        tracemalloc.reset_peak()
+    else:
+        tracemalloc.start()
+    sampler = Sampler(sample_interval)
+    sampler.start()
+    result = {}
+    try:
+        yield result
+    finally:
+        sampler.stopped.set()
+        sampler.join()
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        if not was_tracing:
+            tracemalloc.stop()
+        with _lock:
+            _active = False
+        result["peak_memory_bytes"] = peak
+        try:
+            _write_profile(name, sampler, snapshot, peak)
+        except OSError as e:
+            logging.warning(f"Could not write the profile of {name}: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a generator (or update_readme.py) with profiling enabled.")
+    parser.add_argument("--output-dir", default=profile_dir, help="directory for the profile files")
+    parser.add_argument("--interval-ms", type=float, default=sample_interval * 1000, help="time between two stack samples")
+    parser.add_argument("script", help="the script to run, e.g. .github/actions/generate_macos_standalone_latest.py")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="arguments passed on to the script")
+    args = parser.parse_args()
+
+    # The script imports its own copy of this module, which reads these settings
+    os.environ["MOFA_PROFILE"] = "1"
+    os.environ["MOFA_PROFILE_DIR"] = args.output_dir
+    os.environ["MOFA_PROFILE_INTERVAL_MS"] = str(args.interval_ms)
+
+    sys.argv = [args.script] + args.args
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args.script)))
+    runpy.run_path(args.script, run_name="__main__")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import os
+import time
+import shutil
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import urllib3
+import hash_ledger
+import http_session
+import run_report
+import url_resolver
+
+# Spool directory for partially downloaded packages, so an interrupted download resumes
+spool_dir = os.environ.get("MOFA_DOWNLOAD_DIR", ".cache/downloads")
+
+# Number of byte ranges downloaded in parallel, and the size of each range
+parallel_segments = int(os.environ.get("MOFA_DOWNLOAD_SEGMENTS", "4"))
+segment_size = int(os.environ.get("MOFA_DOWNLOAD_SEGMENT_MB", "64")) * 1024 * 1024
+
+# Attempts per segment before the download is given up (the spool is kept for the next run)
+segment_attempts = int(os.environ.get("MOFA_DOWNLOAD_ATTEMPTS", "5"))
+
+# Spools untouched for this many days are removed
+spool_max_age_days = 7
+
+# Network reads start small and double while they complete quickly, up to the maximum
+min_chunk_size = 64 * 1024
+max_chunk_size = 4 * 1024 * 1024
+fast_read_seconds = 0.25
+
+# Buffer used when hashing spooled segments
+hash_buffer_size = 1024 * 1024
+
+
+def read_adaptively(response):
+    """
+    Yield the body of a streamed response in chunks that grow while the connection keeps up.
+    """
+    chunk_size = min_chunk_size
+    while True:
+        start = time.monotonic()
+        chunk = response.raw.read(chunk_size, decode_content=True)
+        if not chunk:
+            return
+        run_report.count(bytes=len(chunk))
+        yield chunk
+        if chunk_size < max_chunk_size and time.monotonic() - start < fast_read_seconds:
+            chunk_size *= 2
+
+
+def _spool_path(identity):
+    # Spools are keyed by the package identity so a changed package never resumes old bytes
+    key = hashlib.sha256(identity.encode("utf-8")).hexdigest()
+    return os.path.join(spool_dir, key)
+
+
+def _is_transient(error):
+    # Dropped connections, timeouts, short reads and server-side errors are worth
+    # retrying; other HTTP errors (403, 404, 410, 416, ...) will not go away
+    if isinstance(error, requests.exceptions.HTTPError):
+        status = error.response.status_code if error.response is not None else None
+        return status is None or status == 429 or status >= 500
+    return isinstance(error, (
+        requests.exceptions.ConnectionError,
+        requests.exceptions.Timeout,
+        requests.exceptions.ChunkedEncodingError,
+        urllib3.exceptions.HTTPError,
+    ))
+
+
+def _download_segment(url, path, start, end, validator):
+    """
+    Download bytes start..end (inclusive) of url into path, resuming from the bytes
+    already in path and retrying transient errors. Other errors are raised at once.
+    """
+    length = end - start + 1
+    for attempt in range(1, segment_attempts + 1):
+        have = os.path.getsize(path) if os.path.exists(path) else 0
+        if have > length:
+            os.remove(path)
+            have = 0
+        if have == length:
+            return
+
+        # If-Range makes the server answer with the whole file instead of the range if the package changed
+        headers = {"Range": f"bytes={start + have}-{end}", "If-Range": validator}
+        try:
+            with http_session.get(url, headers=headers, stream=True) as response:
+                response.raise_for_status()
+                if response.status_code != 206:
+                    raise ValueError(f"Server did not return the requested range (HTTP {response.status_code}); the package may have changed")
+                with open(path, "ab") as f:
+                    for chunk in read_adaptively(response):
+                        f.write(chunk)
+            if os.path.getsize(path) == length:
+                return
+            error = "connection closed early"
+        except ValueError:
+            raise
+        except Exception as e:
+            if not _is_transient(e):
+                raise
+            error = e
+
+        if attempt < segment_attempts:
+            logging.warning(f"Retrying bytes {start}-{end} of {url} (attempt {attempt}: {error})")
+            time.sleep(min(2 ** attempt, 30))
+
+    raise IOError(f"Could not download bytes {start}-{end} of {url} after {segment_attempts} attempts: {error}")
+
+
+def _hash_file(path, hashers):
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(hash_buffer_size)
+            if not data:
+                return
+            for hasher in hashers.values():
+                hasher.update(data)
+
+
+def _stream_hashes(url, hashers):
+    # Servers without range support: hash the body as it arrives in one request
+    response = http_session.get(url, stream=True, allow_redirects=True)
+    response.raise_for_status()
+    total_bytes = 0
+    with response:
+        for chunk in read_adaptively(response):
+            for hasher in hashers.values():
+                hasher.update(chunk)
+            total_bytes += len(chunk)
+    return hash_ledger.package_identity(response), total_bytes
+
+
+def _range_validator(response):
+    # If-Range needs a strong ETag or a Last-Modified date
+    etag = response.headers.get("ETag", "")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("Last-Modified")
+
+
+def _prune_spools(keep):
+    # Drop spools of packages that were not resumed for a while (the package has most likely changed)
+    if not os.path.isdir(spool_dir):
+        return
+    cutoff = time.time() - spool_max_age_days * 86400
+    for name in os.listdir(spool_dir):
+        path = os.path.join(spool_dir, name)
+        if path != keep and os.path.getmtime(path) < cutoff:
+            logging.info(f"Removing stale download spool {path}")
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _range_hashes(response, hashers):
+    # Download the package as parallel ranges into the spool and hash the segments in order
+    url = response.url
+    content_length = int(response.headers["Content-Length"])
+    identity = hash_ledger.package_identity(response)
+    validator = _range_validator(response)
+
+    spool = _spool_path(identity)
+    _prune_spools(keep=spool)
+    os.makedirs(spool, exist_ok=True)
+    os.utime(spool)
+    ranges = [(start, min(start + segment_size, content_length) - 1) for start in range(0, content_length, segment_size)]
+    resumed = sum(
+        os.path.getsize(os.path.join(spool, f"{index:05d}.part"))
+        for index in range(len(ranges))
+        if os.path.exists(os.path.join(spool, f"{index:05d}.part"))
+    )
+    if resumed:
+        logging.info(f"Resuming {url} with {resumed} of {content_length} bytes already spooled")
+
+    with ThreadPoolExecutor(max_workers=parallel_segments) as executor:
+        segments = [
+            (executor.submit(run_report.bind(_download_segment), url, os.path.join(spool, f"{index:05d}.part"), start, end, validator), index)
+            for index, (start, end) in enumerate(ranges)
+        ]
+        try:
+            # Hash each segment as soon as it and every segment before it are complete
+            for future, index in segments:
+                future.result()
+                _hash_file(os.path.join(spool, f"{index:05d}.part"), hashers)
+        except BaseException:
+            for future, _ in segments:
+                future.cancel()
+            raise
+
+    shutil.rmtree(spool, ignore_errors=True)
+    return identity, content_length
+
+
+def download_hashes(url, algorithms):
+    """
+    Download a package and compute its digests.
+
+    Servers that accept byte ranges and identify the package with an ETag or
+    Last-Modified header are downloaded as parallel ranges into a spool directory, so
+    failed ranges are retried and an interrupted download resumes on the next run. Other
+    servers, and servers that reject or drop the HEAD request, are streamed in a single
+    GET request.
+
+    Returns:
+        tuple: (hex digest per algorithm, hash ledger identity of the bytes or None, number of bytes hashed)
+    """
+    hashers = {algorithm: hashlib.new(algorithm) for algorithm in algorithms}
+
+    try:
+        response = url_resolver.resolve(url)
+    except requests.exceptions.RequestException as e:
+        logging.warning(f"HEAD request for {url} failed ({e}); downloading it in a single request")
+        response = None
+    ranged = (
+        response is not None
+        and response.headers.get("Accept-Ranges", "").lower() == "bytes"
+        and response.headers.get("Content-Length", "").isdigit()
+        and _range_validator(response) is not None
+    )
+
+    if ranged:
+        identity, total_bytes = _range_hashes(response, hashers)
+    else:
+        identity, total_bytes = _stream_hashes(url, hashers)
+
+    return {algorithm: hasher.hexdigest() for algorithm, hasher in hashers.items()}, identity, total_bytes
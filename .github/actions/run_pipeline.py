@@ -0,0 +1,154 @@
+import os
+import json
+import hashlib
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import generate_macos_standalone_latest
+import generate_ios_appstore_latest
+import generate_macos_appstore_latest
+import generate_macos_standalone_cve_history
+import generate_macos_standalone_update_history
+import update_readme
+import output_stage
+import profiler
+
+# Configure logging with a cleaner and more human-readable format
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%B %d, %Y %I:%M %p'
+)
+
+# Fingerprints of each downstream stage's inputs from the last successful run
+state_file = os.environ.get("MOFA_PIPELINE_STATE", ".cache/pipeline_state.json")
+
+# Keys that change on every run without the feed content changing
+volatile_keys = output_stage.volatile_keys
+
+
+def run_readme(inputs):
+    update_readme.main(
+        latest_data=inputs["macos_standalone_latest"],
+        ios_data=inputs["ios_appstore_latest"],
+        macos_data=inputs["macos_appstore_latest"],
+    )
+
+
+# Pipeline stages: name -> (function taking the upstream results, upstream stage names)
+stages = {
+    "macos_standalone_latest": (lambda inputs: generate_macos_standalone_latest.main(), []),
+    "ios_appstore_latest": (lambda inputs: generate_ios_appstore_latest.main(), []),
+    "macos_appstore_latest": (lambda inputs: generate_macos_appstore_latest.main(), []),
+    "macos_standalone_cve_history": (lambda inputs: generate_macos_standalone_cve_history.main(), []),
+    "macos_standalone_update_history": (lambda inputs: generate_macos_standalone_update_history.main(), []),
+    "readme": (run_readme, ["macos_standalone_latest", "ios_appstore_latest", "macos_appstore_latest"]),
+}
+
+
+def fingerprint(inputs):
+    """
+    Hash a stage's upstream results, ignoring the top-level run timestamps.
+
+    Returns:
+        str: The SHA256 hex digest of the stable part of the inputs.
+    """
+    stable = {
+        name: {k: v for k, v in result.items() if k not in volatile_keys} if isinstance(result, dict) else result
+        for name, result in inputs.items()
+    }
+    return hashlib.sha256(json.dumps(stable, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def load_state():
+    try:
+        with open(state_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state):
+    os.makedirs(os.path.dirname(state_file) or ".", exist_ok=True)
+    with open(state_file, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=4, sort_keys=True)
+
+
+def run_pipeline(stages, max_workers=4, force=False):
+    """
+    Run the stages as a dependency graph, starting every stage as soon as its upstream
+    stages have finished and skipping downstream stages whose inputs did not change.
+
+    Returns:
+        dict: Status of each stage: "ok", "skipped" or "failed".
+    """
+    state = load_state()
+    results = {}
+    status = {}
+    input_fingerprints = {}
+    pending = dict(stages)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            for name, (run, upstream) in list(pending.items()):
+                if not all(dep in status for dep in upstream):
+                    continue
+                del pending[name]
+
+                if any(status[dep] == "failed" for dep in upstream):
+                    logging.error(f"Skipping stage {name}: an upstream stage failed.")
+                    status[name] = "failed"
+                    continue
+
+                inputs = {dep: results.get(dep) for dep in upstream}
+                if upstream:
+                    input_fingerprint = fingerprint(inputs)
+                    if not force and state.get(name) == input_fingerprint:
+                        logging.info(f"Skipping stage {name}: inputs unchanged since the last run.")
+                        status[name] = "skipped"
+                        continue
+                    input_fingerprints[name] = input_fingerprint
+
+                logging.info(f"Starting stage {name}")
+                running[executor.submit(run, inputs)] = name
+
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                    status[name] = "ok"
+                    if name in input_fingerprints:
+                        state[name] = input_fingerprints[name]
+                    logging.info(f"Finished stage {name}")
+                except Exception as e:
+                    logging.error(f"Stage {name} failed: {e}")
+                    status[name] = "failed"
+
+    save_state(state)
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run every MOFA feed generator and the README update in one process.")
+    parser.add_argument("--workers", type=int, default=4, help="maximum number of stages to run in parallel")
+    parser.add_argument("--force", action="store_true", help="run downstream stages even if their inputs are unchanged")
+    parser.add_argument("--profile", action="store_true", help=f"profile the whole run into {profiler.profile_dir} (same as MOFA_PROFILE=1)")
+    args = parser.parse_args()
+
+    if args.profile:
+        profiler.enabled = True
+    with profiler.profile("pipeline"):
+        status = run_pipeline(stages, max_workers=args.workers, force=args.force)
+    for name, result in status.items():
+        logging.info(f"{name}: {result}")
+    output_stage.log_report()
+    return 1 if "failed" in status.values() else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
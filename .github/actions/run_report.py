@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import profiler
+
+# Machine-readable report of the last run of each generator, kept with the other run state
+report_file = os.environ.get("MOFA_RUN_REPORT", ".cache/run_report.json")
+
+# Counters kept for every stage, overall and per app
+counters = ("calls", "wall_seconds", "requests", "bytes", "cache_hits", "hashed_bytes", "hash_seconds")
+
+_lock = threading.Lock()
+_local = threading.local()
+_runs = {}
+
+
+def _utc_now():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _scopes():
+    if not hasattr(_local, "scopes"):
+        _local.scopes = []
+    return _local.scopes
+
+
+def _record(generator, stage_name, app, values):
+    with _lock:
+        run_data = _runs.setdefault(generator, {"stages": {}, "apps": {}})
+        targets = [run_data["stages"].setdefault(stage_name, dict.fromkeys(counters, 0))]
+        if app is not None:
+            targets.append(run_data["apps"].setdefault(app, {}).setdefault(stage_name, dict.fromkeys(counters, 0)))
+        for target in targets:
+            for key, value in values.items():
+                target[key] += value
+
+
+@contextmanager
+def stage(stage_name, app=None):
+    """
+    Time a stage of the generator run open in this thread, optionally for one app (nested
+    stages inherit the app). Requests, bytes and cache hits counted while the stage is
+    open are attributed to it, or to the innermost stage when stages are nested.
+    """
+    scopes = _scopes()
+    generator, _, outer_app = scopes[-1] if scopes else (None, None, None)
+    app = app if app is not None else outer_app
+    scopes.append((generator, stage_name, app))
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        scopes.pop()
+        if generator is not None:
+            _record(generator, stage_name, app, {"calls": 1, "wall_seconds": time.perf_counter() - start})
+
+
+def count(**values):
+    """
+    Add to the counters of the innermost stage open in this thread. Work done outside of
+    any generator run is not reported.
+    """
+    scopes = _scopes()
+    if scopes and scopes[-1][0] is not None:
+        _record(*scopes[-1], values)
+
+
+def bind(function):
+    """
+    Wrap a function submitted to a worker thread so that what it counts is attributed to
+    the stage that submitted it.
+    """
+    submitted_scopes = list(_scopes())
+
+    def run_in_scope(*args, **kwargs):
+        scopes = _scopes()
+        saved = scopes[:]
+        scopes[:] = submitted_scopes
+        try:
+            return function(*args, **kwargs)
+        finally:
+            scopes[:] = saved
+
+    return run_in_scope
+
+
+def _summarize(metrics):
+    summary = {key: round(value, 4) if isinstance(value, float) else value for key, value in metrics.items()}
+    if metrics["hash_seconds"] > 0:
+        summary["hash_bytes_per_second"] = round(metrics["hashed_bytes"] / metrics["hash_seconds"])
+    return summary
+
+
+def write_report(generator, section):
+    # Each generator replaces only its own section, so separate processes build one report together
+    with _lock:
+        try:
+            with open(report_file, "r", encoding="utf-8") as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            report = {}
+        report.setdefault("generators", {})[generator] = section
+        report["updated"] = _utc_now()
+
+        os.makedirs(os.path.dirname(report_file) or ".", exist_ok=True)
+        temp_file = f"{report_file}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4, sort_keys=True)
+        os.replace(temp_file, report_file)
+
+
+@contextmanager
+def run(generator):
+    """
+    Measure a whole generator run and write its section of the run report when it ends.
+    Stages opened in this thread (or in functions passed through bind()) belong to it.
+    The run is profiled as well when profiling is enabled (see profiler.py).
+    """
+    started = _utc_now()
+    start = time.perf_counter()
+    # Counters outside of any explicit stage are reported as "unstaged"
+    scopes = _scopes()
+    scopes.append((generator, "unstaged", None))
+    profile = None
+    try:
+        with profiler.profile(generator) as profile:
+            yield
+    finally:
+        scopes.pop()
+        wall_seconds = time.perf_counter() - start
+        with _lock:
+            run_data = _runs.pop(generator, {"stages": {}, "apps": {}})
+        section = {
+            "started": started,
+            "wall_seconds": round(wall_seconds, 4),
+            "stages": {name: _summarize(metrics) for name, metrics in run_data["stages"].items()},
+            "apps": {
+                app: {name: _summarize(metrics) for name, metrics in stages.items()}
+                for app, stages in run_data["apps"].items()
+            },
+        }
+        if profile:
+            section["peak_memory_bytes"] = profile["peak_memory_bytes"]
+        try:
+            write_report(generator, section)
+        except OSError as e:
+            logging.warning(f"Could not write the run report {report_file}: {e}")
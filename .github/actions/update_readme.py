@@ -2,6 +2,7 @@ import xml.etree.ElementTree as ET
 from datetime import datetime
 import pytz
 import logging
+import run_report
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -67,6 +68,35 @@ def parse_appstore_xml(file_path):
 
     return global_last_updated, packages
 
+def load_latest_data(data):
+    logging.info("Loading standalone package data from pipeline results")
+
+    # Same shape as parse_latest_xml, built from the generator's in-memory output
+    global_last_updated = data["last_updated"].strip()
+    packages = {}
+    for package in data["packages"]:
+        name = package["name"].strip().lower()
+        packages[name] = {"name": name}
+        for field in ["application_id", "application_name", "short_version", "full_version", "min_os", "update_download", "latest_download", "sha256"]:
+            packages[name][field] = (package.get(field) or "").strip()
+
+    return global_last_updated, packages
+
+def load_appstore_data(data):
+    logging.info("Loading AppStore package data from pipeline results")
+
+    # Same shape as parse_appstore_xml, built from the generator's in-memory output
+    global_last_updated = data["last_updated"].strip()
+    packages = {}
+    for package in data["packages"]:
+        name = package["name"].strip().lower()
+        packages[name] = {"name": name}
+        for field in ["application_name", "bundleId", "currentVersionReleaseDate", "icon_image", "minimumOsVersion", "releaseNotes", "version"]:
+            key = "bundleid" if field == "bundleId" else field
+            packages[name][key] = (package.get(field) or "").strip()
+
+    return global_last_updated, packages
+
 def generate_ios_table(ios_packages):
     logging.info("Generating iOS AppStore table content")
 
@@ -380,23 +410,49 @@ def get_macos_package_detail(macos_packages, package_name, detail):
     else:
         return None
 
-if __name__ == "__main__":
+@run_report.run("readme")
+def main(latest_data=None, ios_data=None, macos_data=None):
+    """
+    Regenerate README.md from the standalone, iOS and macOS feeds.
+
+    Args:
+        latest_data (dict): In-memory standalone feed from the pipeline, or None to parse the XML file.
+        ios_data (dict): In-memory iOS App Store feed, or None to parse the XML file.
+        macos_data (dict): In-memory macOS App Store feed, or None to parse the XML file.
+    """
+    global ios_last_updated, macos_last_updated
+
     # Define file paths
     xml_file_path = "latest_raw_files/macos_standalone_latest.xml"  # Update this path if the file is located elsewhere
     ios_appstore_xml_path = "latest_raw_files/ios_appstore_latest.xml"
     macos_appstore_xml_path = "latest_raw_files/macos_appstore_latest.xml"
     readme_file_path = "README.md"
 
-    # Parse the XML and generate content
-    global_last_updated, packages = parse_latest_xml(xml_file_path)
-    ios_last_updated, ios_packages = parse_appstore_xml(ios_appstore_xml_path)
-    macos_last_updated, macos_packages = parse_appstore_xml(macos_appstore_xml_path)
+    # Use the pipeline's results when available, otherwise parse the XML and generate content
+    with run_report.stage("load_feeds"):
+        if latest_data is not None:
+            global_last_updated, packages = load_latest_data(latest_data)
+        else:
+            global_last_updated, packages = parse_latest_xml(xml_file_path)
+        if ios_data is not None:
+            ios_last_updated, ios_packages = load_appstore_data(ios_data)
+        else:
+            ios_last_updated, ios_packages = parse_appstore_xml(ios_appstore_xml_path)
+        if macos_data is not None:
+            macos_last_updated, macos_packages = load_appstore_data(macos_data)
+        else:
+            macos_last_updated, macos_packages = parse_appstore_xml(macos_appstore_xml_path)
 
     # Merge packages
     packages.update(ios_packages)
     packages.update(macos_packages)
 
-    readme_content = generate_readme_content(global_last_updated, packages, ios_packages, macos_packages)
+    with run_report.stage("render_readme"):
+        readme_content = generate_readme_content(global_last_updated, packages, ios_packages, macos_packages)
 
     # Overwrite the README file
-    overwrite_readme(readme_file_path, readme_content)
+    with run_report.stage("write_outputs"):
+        overwrite_readme(readme_file_path, readme_content)
+
+if __name__ == "__main__":
+    main()
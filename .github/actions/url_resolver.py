@@ -0,0 +1,80 @@
+import logging
+import threading
+from concurrent.futures import Future
+import http_session
+import run_report
+
+# Per-run cache of HEAD responses for download links, keyed by the requested URL
+_lock = threading.Lock()
+_resolutions = {}
+
+
+def _head(url):
+    with run_report.stage("resolve_download"):
+        response = http_session.head(url, allow_redirects=True)
+        response.raise_for_status()
+        return response
+
+
+def prefetch(urls, executor):
+    """
+    Start resolving download links concurrently; later resolve() calls wait for these requests.
+    """
+    with _lock:
+        for url in urls:
+            if url not in _resolutions:
+                _resolutions[url] = executor.submit(run_report.bind(_head), url)
+
+
+def resolve(url):
+    """
+    Follow the redirects of a download link (e.g. a go.microsoft.com fwlink) with a HEAD
+    request, once per run.
+
+    Returns:
+        requests.Response: The HEAD response of the final URL.
+    """
+    with _lock:
+        future = _resolutions.get(url)
+        if future is None:
+            future = _resolutions[url] = Future()
+            owner = True
+        else:
+            owner = False
+
+    if owner:
+        try:
+            future.set_result(_head(url))
+        except Exception as e:
+            future.set_exception(e)
+    return future.result()
+
+
+def download_fields(url, fallback=None):
+    """
+    Resolve a download link into the package fields that describe the file behind it.
+
+    Args:
+        url (str): The download link.
+        fallback (dict): Values to keep when the link cannot be resolved, typically the
+            existing entry for the same link, so a failed request does not look like a new package.
+
+    The ETag is deliberately not part of it: CDN edge servers send different ETags for
+    the same file, so publishing it would rewrite the feed without the package changing.
+
+    Returns:
+        dict: resolved_download and download_size, "N/A" when unknown.
+    """
+    fields = dict.fromkeys(("resolved_download", "download_size"), "N/A")
+    if not url or url == "N/A":
+        return fields
+    try:
+        response = resolve(url)
+    except Exception as e:
+        logging.warning(f"Could not resolve {url}: {e}")
+        if fallback:
+            return {key: fallback.get(key, "N/A") for key in fields}
+        return fields
+    fields["resolved_download"] = response.url
+    fields["download_size"] = response.headers.get("Content-Length", "N/A")
+    return fields
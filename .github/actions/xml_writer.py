@@ -0,0 +1,57 @@
+def _escape(data):
+    # Same escaping as xml.dom.minidom's writer, so the output is byte-identical to toprettyxml()
+    return data.replace("&", "&amp;").replace("<", "&lt;").replace("\"", "&quot;").replace(">", "&gt;")
+
+
+def _normalize_newlines(data):
+    # Text read back by an XML parser has its line endings normalized to "\n"
+    return data.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _write_element(f, element, indent, addindent, newl):
+    f.write(indent + "<" + element.tag)
+    for name, value in element.attrib.items():
+        f.write(f" {name}=\"{_escape(value)}\"")
+
+    # The DOM children minidom would see: leading text, then each child and its tail text
+    children = []
+    if element.text:
+        children.append(_normalize_newlines(element.text))
+    for child in element:
+        children.append(child)
+        if child.tail:
+            children.append(_normalize_newlines(child.tail))
+
+    if not children:
+        f.write("/>" + newl)
+        return
+
+    f.write(">")
+    if len(children) == 1 and isinstance(children[0], str):
+        f.write(_escape(children[0]))
+    else:
+        f.write(newl)
+        for child in children:
+            if isinstance(child, str):
+                f.write(_escape(indent + addindent + child + newl))
+            else:
+                _write_element(f, child, indent + addindent, addindent, newl)
+        f.write(indent)
+    f.write(f"</{element.tag}>{newl}")
+
+
+def write_pretty_xml(element, f, indent="\t", newl="\n"):
+    """
+    Write an ElementTree element to an open text file as indented XML.
+
+    The output is byte-identical to minidom.parseString(ET.tostring(element)).toprettyxml(),
+    but it is streamed straight to the file without building a second DOM.
+
+    Args:
+        element (xml.etree.ElementTree.Element): The root element to write.
+        f: A text file (or any object with a write method).
+        indent (str): The string added for each level of nesting.
+        newl (str): The line separator.
+    """
+    f.write('<?xml version="1.0" ?>' + newl)
+    _write_element(f, element, "", indent, newl)